@@ -0,0 +1,128 @@
+from sqlalchemy.orm import Session
+from datetime import datetime
+import math
+import threading
+import models
+from database import TIMESTAMP_FORMAT
+
+# Inline anomaly detection for ingested telemetry. Each ship keeps an
+# exponentially weighted mean and variance per metric (constant size, a few
+# float operations per sample); a sample is scored against the state *before*
+# it is folded in. Rules:
+#   fuel_spike    fuel_consumption far above its mean while rpm stays near its mean
+#   rpm_collapse  rpm far below its mean while the ship is under way
+# State lives in memory and is warmed from the ship's latest stored telemetry
+# the first time a ship is seen by this process, so a restart loses nothing.
+
+ALPHA = 0.05          # weight of the newest sample (~20-sample memory)
+Z_THRESHOLD = 4.0
+RPM_STEADY_Z = 1.5    # |z| of rpm still counted as "constant rpm"
+MIN_STD_RATIO = 0.02  # std floor relative to the mean, so flat signals don't alert on noise
+UNDER_WAY_SPEED = 3.0  # knots
+WARMUP_SAMPLES = 30
+HISTORY_SAMPLES = 200
+
+_METRICS = ("rpm", "speed", "fuel_consumption")
+
+class _Ewma:
+    __slots__ = ("mean", "var")
+
+    def __init__(self, value):
+        self.mean = value
+        self.var = 0.0
+
+    def zscore(self, value):
+        std = max(math.sqrt(self.var), MIN_STD_RATIO * abs(self.mean), 1e-9)
+        return (value - self.mean) / std
+
+    def update(self, value):
+        diff = value - self.mean
+        increment = ALPHA * diff
+        self.mean += increment
+        self.var = (1 - ALPHA) * (self.var + diff * increment)
+
+class _ShipState:
+    __slots__ = ("samples", "last_timestamp", "rpm", "speed", "fuel_consumption")
+
+    def __init__(self):
+        self.samples = 0
+        self.last_timestamp = None
+        self.rpm = self.speed = self.fuel_consumption = None
+
+    def observe(self, timestamp, rpm, speed, fuel):
+        # Returns [(kind, metric, value, expected, zscore)] for this sample
+        if self.last_timestamp is not None and timestamp <= self.last_timestamp:
+            return []  # out of order or redelivered: scoring it would corrupt the state
+        self.last_timestamp = timestamp
+        if None in (rpm, speed, fuel) or not all(math.isfinite(v) for v in (rpm, speed, fuel)):
+            return []  # a NaN/inf would poison the running mean and variance for good
+        alerts = []
+        if self.samples == 0:
+            self.rpm, self.speed, self.fuel_consumption = _Ewma(rpm), _Ewma(speed), _Ewma(fuel)
+        elif self.samples >= WARMUP_SAMPLES:
+            rpm_z = self.rpm.zscore(rpm)
+            fuel_z = self.fuel_consumption.zscore(fuel)
+            if fuel_z > Z_THRESHOLD and abs(rpm_z) < RPM_STEADY_Z:
+                alerts.append(("fuel_spike", "fuel_consumption", fuel, self.fuel_consumption.mean, fuel_z))
+            if rpm_z < -Z_THRESHOLD and self.speed.mean > UNDER_WAY_SPEED:
+                alerts.append(("rpm_collapse", "rpm", rpm, self.rpm.mean, rpm_z))
+        if self.samples:
+            self.rpm.update(rpm)
+            self.speed.update(speed)
+            self.fuel_consumption.update(fuel)
+        self.samples += 1
+        return alerts
+
+_states = {}
+_lock = threading.Lock()
+
+def _warm(db: Session, ship_id: int, before: datetime):
+    state = _ShipState()
+    history = db.query(
+        models.Telemetry.timestamp, models.Telemetry.rpm, models.Telemetry.speed, models.Telemetry.fuel_consumption
+    ).filter(
+        models.Telemetry.ship_id == ship_id, models.Telemetry.timestamp < before
+    ).order_by(models.Telemetry.timestamp.desc()).limit(HISTORY_SAMPLES).all()
+    for timestamp, rpm, speed, fuel in reversed(history):
+        state.observe(timestamp, rpm, speed, fuel)
+    return state
+
+_INSERT_ALERTS = (
+    "INSERT INTO alerts (ship_id, timestamp, kind, metric, value, expected, zscore, created_at) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+def process_rows(db: Session, rows):
+    # rows in crud.TELEMETRY_COLUMNS order; alerts are written in the caller's transaction
+    found = []
+    with _lock:
+        for ship_id, timestamp, rpm, speed, fuel, _, _, _ in rows:
+            state = _states.get(ship_id)
+            if state is None:
+                state = _states[ship_id] = _warm(db, ship_id, timestamp)
+            for alert in state.observe(timestamp, rpm, speed, fuel):
+                found.append((ship_id, timestamp, *alert))
+    if found:
+        created = datetime.utcnow().strftime(TIMESTAMP_FORMAT)
+        db.connection().exec_driver_sql(_INSERT_ALERTS, [
+            (ship_id, timestamp.strftime(TIMESTAMP_FORMAT), kind, metric, value, expected, zscore, created)
+            for ship_id, timestamp, kind, metric, value, expected, zscore in found
+        ])
+    return len(found)
+
+def discard(ship_ids):
+    # After a rolled-back write the in-memory state is ahead of the database;
+    # drop it so it is rebuilt from what was actually stored
+    with _lock:
+        for ship_id in ship_ids:
+            _states.pop(ship_id, None)
+
+def get_alerts(db: Session, ship_id: int = None, kind: str = None, since: datetime = None, limit: int = 100):
+    query = db.query(models.Alert)
+    if ship_id is not None:
+        query = query.filter(models.Alert.ship_id == ship_id)
+    if kind:
+        query = query.filter(models.Alert.kind == kind)
+    if since:
+        query = query.filter(models.Alert.timestamp >= since)
+    return query.order_by(models.Alert.timestamp.desc()).limit(limit).all()
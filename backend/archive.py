@@ -0,0 +1,182 @@
+from sqlalchemy.orm import Session
+from collections import namedtuple
+from datetime import datetime, timedelta
+import argparse
+import struct
+import time
+import zlib
+import lazy, migrations, models, rollups
+from database import SessionLocal, engine
+
+np = lazy.load("numpy")
+
+# Cold tier for telemetry: once a ship-day is older than the archive horizon
+# its rows are packed into one compressed, column-wise chunk
+# (telemetry_chunks) and removed from the row table.
+#
+# Chunk layout: "TCK1" | u32 sample count | zlib(columns), with each column
+# n x 8 bytes, byte-shuffled (all first bytes, then all second bytes, ...):
+#   id          zigzag delta
+#   timestamp   zigzag delta-of-delta of epoch microseconds
+#   6 floats    XOR of each value's bits with the previous value's bits
+# Regular sampling makes timestamp deltas-of-deltas mostly zero, and slowly
+# changing values share sign/exponent/high mantissa bits with their
+# predecessor, so the shuffled streams are long runs that zlib squeezes well.
+
+DEFAULT_ARCHIVE_DAYS = 7
+DEFAULT_PAUSE = 0.02
+
+MAGIC = b"TCK1"
+_HEADER = struct.Struct("<4sI")
+FLOAT_COLUMNS = ("rpm", "speed", "fuel_consumption", "latitude", "longitude", "heading")
+
+# Attribute-compatible stand-in for models.Telemetry rows read back from chunks
+TelemetryRow = namedtuple("TelemetryRow", "id ship_id timestamp " + " ".join(FLOAT_COLUMNS))
+
+_COLUMNS = (
+    models.Telemetry.id, models.Telemetry.timestamp, models.Telemetry.rpm, models.Telemetry.speed,
+    models.Telemetry.fuel_consumption, models.Telemetry.latitude, models.Telemetry.longitude,
+    models.Telemetry.heading,
+)
+
+def _zigzag(values):
+    return ((values << 1) ^ (values >> 63)).view(np.uint64)
+
+def _unzigzag(values):
+    return (values >> np.uint64(1)).view(np.int64) ^ -(values & np.uint64(1)).view(np.int64)
+
+def _shuffle(values):
+    return values.view(np.uint8).reshape(-1, 8).T.tobytes()
+
+def _unshuffle(buffer, count):
+    return np.frombuffer(buffer, dtype=np.uint8).reshape(8, count).T.copy().view(np.uint64).ravel()
+
+def encode(rows):
+    # rows: (id, timestamp, rpm, speed, fuel_consumption, latitude, longitude, heading), oldest first
+    columns = list(zip(*rows))
+    ids = np.array(columns[0], dtype=np.int64)
+    micros = np.array(columns[1], dtype="datetime64[us]").astype(np.int64)
+    parts = [
+        _shuffle(_zigzag(np.diff(ids, prepend=0))),
+        _shuffle(_zigzag(np.diff(np.diff(micros, prepend=0), prepend=0))),
+    ]
+    for values in columns[2:]:
+        bits = np.array(values, dtype=np.float64).view(np.uint64)  # None -> NaN
+        parts.append(_shuffle(bits ^ np.concatenate((np.zeros(1, np.uint64), bits[:-1]))))
+    return _HEADER.pack(MAGIC, len(rows)) + zlib.compress(b"".join(parts), 9)
+
+def decode(data: bytes):
+    # Returns (ids, epoch microseconds, {column: float64 array}) as NumPy arrays
+    magic, count = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Not a telemetry chunk")
+    raw = zlib.decompress(data[_HEADER.size:])
+    size = count * 8
+    block = lambda i: _unshuffle(raw[i * size:(i + 1) * size], count)
+    ids = np.cumsum(_unzigzag(block(0)))
+    micros = np.cumsum(np.cumsum(_unzigzag(block(1))))
+    floats = {
+        name: np.bitwise_xor.accumulate(block(i + 2)).view(np.float64)
+        for i, name in enumerate(FLOAT_COLUMNS)
+    }
+    return ids, micros, floats
+
+def decode_rows(data: bytes, ship_id: int, start: datetime = None, end: datetime = None):
+    # TelemetryRow tuples, oldest first
+    ids, micros, floats = decode(data)
+    mask = np.ones(len(ids), dtype=bool)
+    if start is not None:
+        mask &= micros >= np.datetime64(start, "us").astype(np.int64)
+    if end is not None:
+        mask &= micros <= np.datetime64(end, "us").astype(np.int64)
+    timestamps = micros[mask].astype("datetime64[us]").tolist()
+    values = [
+        [None if v != v else v for v in floats[name][mask].tolist()]
+        for name in FLOAT_COLUMNS
+    ]
+    ship_ids = [ship_id] * len(timestamps)
+    return list(map(TelemetryRow._make, zip(ids[mask].tolist(), ship_ids, timestamps, *values)))
+
+def chunks_in_range(db: Session, ship_id: int, start: datetime = None, end: datetime = None):
+    # Chunk metadata only, newest day first; the blob is fetched per chunk when needed
+    query = db.query(models.TelemetryChunk.day, models.TelemetryChunk.last_timestamp).filter(
+        models.TelemetryChunk.ship_id == ship_id
+    )
+    if start:
+        query = query.filter(models.TelemetryChunk.last_timestamp >= start)
+    if end:
+        query = query.filter(models.TelemetryChunk.first_timestamp <= end)
+    return query.order_by(models.TelemetryChunk.day.desc()).all()
+
+def load_chunk(db: Session, ship_id: int, day: datetime, start: datetime = None, end: datetime = None):
+    data = db.query(models.TelemetryChunk.data).filter(
+        models.TelemetryChunk.ship_id == ship_id, models.TelemetryChunk.day == day
+    ).scalar()
+    return decode_rows(data, ship_id, start, end) if data else []
+
+def archive_day(db: Session, ship_id: int, day: datetime):
+    end = day + timedelta(days=1)
+    live = db.query(models.Telemetry).filter(
+        models.Telemetry.ship_id == ship_id,
+        models.Telemetry.timestamp >= day,
+        models.Telemetry.timestamp < end,
+    )
+    rows = [tuple(r) for r in live.with_entities(*_COLUMNS).order_by(models.Telemetry.timestamp).all()]
+    if not rows:
+        return 0, 0
+    # Rollups are fed from the rows table, so fold these rows in before they move
+    for hour in sorted({rollups.floor_hour(r[1]) for r in rows}):
+        rollups.merge_hour(db, ship_id, hour)
+    chunk = db.get(models.TelemetryChunk, (ship_id, day))
+    archived = rows
+    if chunk:
+        # Late samples for an already archived day: merge them into its chunk
+        previous = [(r[0], *r[2:]) for r in decode_rows(chunk.data, ship_id)]
+        archived = sorted(previous + rows, key=lambda r: r[1])
+    data = encode(archived)
+    db.merge(models.TelemetryChunk(
+        ship_id=ship_id, day=day, samples=len(archived),
+        first_timestamp=archived[0][1], last_timestamp=archived[-1][1], data=data,
+    ))
+    live.delete(synchronize_session=False)
+    rollups.rebuild_day(db, ship_id, day)
+    db.commit()
+    return len(rows), len(data)
+
+def run(db: Session, archive_days: int = DEFAULT_ARCHIVE_DAYS, pause: float = DEFAULT_PAUSE, now: datetime = None, log=print):
+    cutoff = rollups.floor_day((now or datetime.utcnow()) - timedelta(days=archive_days))
+    stats = {"days": 0, "rows": 0, "chunk_bytes": 0}
+    started = time.monotonic()
+    for ship in db.query(models.Ship).order_by(models.Ship.id).all():
+        while True:
+            oldest = db.query(models.Telemetry.timestamp).filter(
+                models.Telemetry.ship_id == ship.id, models.Telemetry.timestamp < cutoff
+            ).order_by(models.Telemetry.timestamp).limit(1).scalar()
+            if oldest is None:
+                break
+            day = rollups.floor_day(oldest)
+            rows, size = archive_day(db, ship.id, day)
+            stats["days"] += 1
+            stats["rows"] += rows
+            stats["chunk_bytes"] += size
+            log(f"{ship.mmsi} {day:%Y-%m-%d}: {rows} rows -> {size} bytes")
+            if pause:
+                time.sleep(pause)
+    stats["seconds"] = round(time.monotonic() - started, 2)
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Move telemetry older than N days into compressed columnar chunks")
+    parser.add_argument("--days", type=int, default=DEFAULT_ARCHIVE_DAYS, help="keep this many days in the row table")
+    parser.add_argument("--pause", type=float, default=DEFAULT_PAUSE, help="seconds to sleep between ship-days")
+    args = parser.parse_args()
+
+    migrations.run(engine)
+    db = SessionLocal()
+    try:
+        print(run(db, args.days, args.pause))
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
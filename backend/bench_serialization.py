@@ -0,0 +1,102 @@
+from datetime import datetime, timedelta
+from typing import List
+from pydantic import TypeAdapter
+import argparse
+import gzip
+import json
+import struct
+import os
+import tempfile
+import time
+
+# Compares the two response paths for GET /telemetry/{mmsi} on a scratch
+# database: ORM objects validated into schemas.Telemetry and encoded the way
+# FastAPI's JSONResponse does, versus column tuples encoded by serialize.py.
+# Then compares the response formats (rows, columnar, binary) by payload size
+# and by the time it takes to parse them back into per-field arrays.
+#
+#   python bench_serialization.py --rows 5000 50000
+
+def seed(db, ship_id, count):
+    import ingest
+    start = datetime(2026, 1, 1)
+    rows = [
+        (ship_id, start + timedelta(seconds=10 * i), 1800.0 + i % 400, 12.5, 230.25 + i % 7,
+         10.5 + i * 1e-5, 106.7 + i * 1e-5, float(i % 360))
+        for i in range(count)
+    ]
+    ingest.write_rows(db, rows)
+
+def orm_path(db, adapter, ship_id, limit):
+    import models
+    objects = db.query(models.Telemetry).filter(models.Telemetry.ship_id == ship_id).order_by(
+        models.Telemetry.timestamp.desc()).limit(limit).all()
+    content = adapter.dump_python(adapter.validate_python(objects, from_attributes=True), mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+def tuple_path(db, ship_id, limit):
+    import crud, serialize
+    return serialize.telemetry_json(crud.get_telemetry(db, ship_id, limit=limit))
+
+def parse_rows(body):
+    rows = json.loads(body)
+    return {field: [r[field] for r in rows] for field in ("timestamp", "rpm", "fuel_consumption", "latitude", "longitude")}
+
+def parse_columnar(body):
+    return json.loads(body)
+
+def parse_binary(body):
+    import serialize
+    from array import array
+    _, count = struct.unpack_from("<4sI", body)
+    columns = array("d")
+    columns.frombytes(body[8:])
+    return {field: columns[i * count:(i + 1) * count] for i, field in enumerate(serialize.COLUMNS)}
+
+def timed(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, body
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark telemetry response serialization")
+    parser.add_argument("--rows", type=int, nargs="+", default=[5000, 50000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp())  # database.py opens ./sql_app.db
+    import crud, migrations, schemas, serialize
+    from database import SessionLocal, engine
+    migrations.run(engine)
+    db = SessionLocal()
+    ship = crud.create_ship(db, schemas.ShipCreate(name="Bench", mmsi="BENCH"))
+    seed(db, ship.id, max(args.rows))
+    adapter = TypeAdapter(List[schemas.Telemetry])
+    print(f"encoder: {'orjson' if serialize.orjson else 'json'}")
+    for limit in args.rows:
+        orm, expected = timed(lambda: orm_path(db, adapter, ship.id, limit), args.repeat)
+        fast, body = timed(lambda: tuple_path(db, ship.id, limit), args.repeat)
+        same = json.loads(body) == json.loads(expected)
+        print(f"{limit:>7} rows  ORM+Pydantic {orm * 1000:8.1f} ms  tuples+{'orjson' if serialize.orjson else 'json'} "
+              f"{fast * 1000:8.1f} ms  {orm / fast:4.1f}x  identical={same}")
+    for limit in args.rows:
+        rows = crud.get_telemetry(db, ship.id, limit=limit)
+        baseline = None
+        for name, encode, parse in (
+            ("rows", serialize.telemetry_json, parse_rows),
+            ("columnar", serialize.telemetry_columnar, parse_columnar),
+            ("binary", serialize.telemetry_binary, parse_binary),
+        ):
+            body = encode(rows)
+            parse_time, _ = timed(lambda: parse(body), args.repeat)
+            baseline = baseline or (len(body), parse_time)
+            print(f"{limit:>7} rows  {name:<9} {len(body) / 1e3:9.1f} kB  gzip {len(gzip.compress(body, 6)) / 1e3:8.1f} kB"
+                  f"  parse {parse_time * 1000:7.1f} ms  ({baseline[0] / len(body):.1f}x smaller, {baseline[1] / parse_time:.1f}x faster)")
+    db.close()
+
+if __name__ == "__main__":
+    main()
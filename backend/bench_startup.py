@@ -0,0 +1,120 @@
+from datetime import datetime, timedelta
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# Cold start of an API worker on a scratch database, each run in a fresh
+# interpreter: time to import main, to start serving (lifespan: migrations,
+# warm-up thread started) and until GET /ready reports the live rings warm.
+# Then breaks the import of main down by the modules it pulls in (python -X
+# importtime) and times the modules that are only imported on first use.
+#
+#   python bench_startup.py --ships 50 --rows 2000 --runs 5
+
+BACKEND = os.path.dirname(os.path.abspath(__file__))
+
+_PHASES = """
+import json, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(main.app) as client:
+    serving = time.perf_counter()
+    while client.get("/ready").status_code != 200:
+        time.sleep(0.002)
+    ready = time.perf_counter()
+print(json.dumps({
+    "import main": imported - started,
+    "lifespan (until serving)": serving - imported,
+    "until /ready": ready - imported,
+    **{f"  {name}": seconds for name, seconds in main.startup.state["phases"].items()},
+}))
+"""
+
+# Modules main no longer imports eagerly, and what they cost when first used
+_DEFERRED = """
+import json, time
+import crud
+costs = {}
+for name, load in (
+    ("numpy", lambda: __import__("numpy")),
+    ("passlib CryptContext", crud.get_pwd_context),
+    ("msgpack", lambda: __import__("msgpack")),
+    ("zstandard", lambda: __import__("zstandard")),
+):
+    started = time.perf_counter()
+    try:
+        load()
+    except ImportError:
+        continue
+    costs[name] = time.perf_counter() - started
+print(json.dumps(costs))
+"""
+
+def seed(ships, rows):
+    import ingest, migrations
+    from database import SessionLocal, engine
+    migrations.run(engine)
+    db = SessionLocal()
+    start = datetime(2026, 1, 1)
+    ids = ingest.resolve_ships(db, [f"BENCH{i:04d}" for i in range(ships)])
+    for ship_id in ids.values():
+        ingest.write_rows(db, [
+            (ship_id, start + timedelta(seconds=30 * i), 1800.0, 12.5, 230.0, 10.5 + i * 1e-4, 106.7, 90.0)
+            for i in range(rows)
+        ])
+    db.close()
+
+def run(code, *flags):
+    env = {**os.environ, "PYTHONPATH": BACKEND}
+    return subprocess.run([sys.executable, *flags, "-c", code], env=env, capture_output=True, text=True, check=True)
+
+def import_breakdown(top):
+    # -X importtime lines: "import time: self | cumulative | <indent>module";
+    # direct imports of main are indented one level below it
+    lines = run("import main", "-X", "importtime").stderr.splitlines()
+    entries = []
+    for line in lines:
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        entries.append((int(cumulative), name))
+    main_total = next(c for c, name in entries if name.strip() == "main")
+    children = sorted(((c, name.strip()) for c, name in entries if name.startswith("   ") and not name.startswith("     ")), reverse=True)
+    imported = {name.strip().split(".")[0] for _, name in entries}
+    return main_total, children[:top], imported
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark API worker cold start")
+    parser.add_argument("--ships", type=int, default=50)
+    parser.add_argument("--rows", type=int, default=2000, help="telemetry rows per ship")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=12, help="modules listed in the import breakdown")
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp())  # database.py opens ./sql_app.db
+    sys.path.insert(0, BACKEND)
+    seed(args.ships, args.rows)
+
+    runs = [json.loads(run(_PHASES).stdout.splitlines()[-1]) for _ in range(args.runs)]
+    print(f"startup phases, median of {args.runs} runs ({args.ships} ships x {args.rows} rows)")
+    for phase in runs[0]:
+        print(f"  {phase:<28} {statistics.median(r[phase] for r in runs) * 1000:8.1f} ms")
+
+    total, children, imported = import_breakdown(args.top)
+    print(f"\nimport main: {total / 1000:.1f} ms (python -X importtime, cumulative)")
+    for cumulative, name in children:
+        print(f"  {name:<28} {cumulative / 1000:8.1f} ms")
+
+    print("\ndeferred until first use")
+    for name, seconds in json.loads(run(_DEFERRED).stdout.splitlines()[-1]).items():
+        eager = "imported by main!" if name.split()[0] in imported else "not imported at startup"
+        print(f"  {name:<28} {seconds * 1000:8.1f} ms  ({eager})")
+
+if __name__ == "__main__":
+    main()
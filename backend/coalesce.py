@@ -0,0 +1,107 @@
+from collections import OrderedDict
+import threading
+import time
+
+# Single-flight cache for dashboard reads. Concurrent callers asking for the
+# same key share one computation: the first one runs it, the others wait for
+# its result. Results are kept for a short TTL (callers put the data version
+# in the key, so a hit is never stale) and dropped early when ingest touches
+# a ship they are tagged with. Load then follows the number of distinct views
+# rather than the number of people looking at them. Meant for small, hot
+# responses: results are bytes (or tuples holding bytes), the cache is bounded
+# by total size, and results above MAX_RESULT_BYTES are only shared with the
+# callers already waiting, never kept.
+
+TTL_SECONDS = 2.0
+MAX_ENTRIES = 1024
+MAX_BYTES = 16 * 1024 * 1024
+MAX_RESULT_BYTES = 1024 * 1024
+FLEET = "fleet"  # tag for fleet-wide results, dropped on any ingest
+
+class _Call:
+    __slots__ = ("done", "result", "error", "expires", "tags", "nbytes")
+
+    def __init__(self, tags):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.expires = None
+        self.tags = tags
+        self.nbytes = 0
+
+_entries = OrderedDict()  # least recently used first
+_lock = threading.Lock()
+_total_bytes = 0
+stats = {"calls": 0, "shared": 0, "hits": 0}
+
+def _nbytes(result):
+    if isinstance(result, (bytes, bytearray)):
+        return len(result)
+    if isinstance(result, tuple):
+        return sum(_nbytes(part) for part in result)
+    return 0
+
+def _remove(key):
+    global _total_bytes
+    call = _entries.pop(key)
+    _total_bytes -= call.nbytes
+
+def _evict(now):
+    # Expired results first, then least recently used ones beyond the bounds;
+    # in-flight calls (expires None) stay so their waiters keep sharing
+    for key in [key for key, call in _entries.items() if call.expires is not None and call.expires <= now]:
+        _remove(key)
+    for key in [key for key, call in _entries.items() if call.expires is not None]:
+        if len(_entries) <= MAX_ENTRIES and _total_bytes <= MAX_BYTES:
+            break
+        _remove(key)
+
+def get(key, compute, tags=(), ttl: float = TTL_SECONDS):
+    global _total_bytes
+    now = time.monotonic()
+    with _lock:
+        stats["calls"] += 1
+        call = _entries.get(key)
+        if call is not None and (call.expires is None or call.expires > now):
+            stats["shared" if call.expires is None else "hits"] += 1
+            _entries.move_to_end(key)
+            leader = False
+        else:
+            if call is not None:
+                _remove(key)
+            _evict(now)
+            call = _entries[key] = _Call(tuple(tags))
+            leader = True
+    if not leader:
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+    try:
+        call.result = compute()
+    except Exception as e:
+        call.error = e
+        with _lock:
+            if _entries.get(key) is call:
+                _remove(key)
+        raise
+    finally:
+        call.expires = time.monotonic() + ttl
+        call.done.set()
+    with _lock:
+        if _entries.get(key) is call:
+            call.nbytes = _nbytes(call.result)
+            _total_bytes += call.nbytes
+            if call.nbytes > MAX_RESULT_BYTES:
+                _remove(key)
+            else:
+                _evict(time.monotonic())
+    return call.result
+
+def invalidate(ship_ids):
+    # New telemetry for these ships: drop their cached results and every
+    # fleet-wide one; callers already waiting on an in-flight call still get it
+    tags = set(ship_ids) | {FLEET}
+    with _lock:
+        for key in [key for key, call in _entries.items() if tags.intersection(call.tags)]:
+            _remove(key)
@@ -1,15 +1,24 @@
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
-from datetime import datetime
-import models, schemas
-from passlib.context import CryptContext
+from datetime import datetime, timedelta, timezone
+import models, schemas, archive
+from database import TIMESTAMP_FORMAT
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+_pwd_context = None
+
+def get_pwd_context():
+    # Built on first login/user creation rather than at import (passlib, bcrypt backend)
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+        _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return _pwd_context
 
 def get_user(db: Session, username: str):
     return db.query(models.User).filter(models.User.username == username).first()
 
 def create_user(db: Session, user: schemas.UserCreate):
-    hashed_password = pwd_context.hash(user.password)
+    hashed_password = get_pwd_context().hash(user.password)
     db_user = models.User(username=user.username, hashed_password=hashed_password)
     db.add(db_user)
     db.commit()
@@ -26,31 +35,124 @@ def create_ship(db: Session, ship: schemas.ShipCreate):
     db.refresh(db_ship)
     return db_ship
 
+def get_ships_by_mmsi(db: Session, mmsis):
+    ships = db.query(models.Ship).filter(models.Ship.mmsi.in_(list(mmsis))).all()
+    return {ship.mmsi: ship for ship in ships}
+
 def get_all_ships(db: Session, skip: int = 0, limit: int = 100):
    return db.query(models.Ship).offset(skip).limit(limit).all()
 
-def create_telemetry(db: Session, telemetry: schemas.TelemetryCreate, ship_id: int):
-    db_telemetry = models.Telemetry(**telemetry.dict(), ship_id=ship_id)
-    db.add(db_telemetry)
-    db.commit()
-    db.refresh(db_telemetry)
-    return db_telemetry
+TELEMETRY_COLUMNS = ("ship_id", "timestamp", "rpm", "speed", "fuel_consumption", "latitude", "longitude", "heading")
+
+# Duplicates of (ship_id, timestamp) are skipped by the unique index
+_INSERT_TELEMETRY = (
+    "INSERT OR IGNORE INTO telemetry (ship_id, timestamp, rpm, speed, fuel_consumption, latitude, longitude, heading) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+def to_utc_naive(value: datetime):
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def insert_telemetry_rows(db: Session, rows):
+    # rows: tuples in TELEMETRY_COLUMNS order
+    params = [(r[0], r[1].strftime(TIMESTAMP_FORMAT)) + tuple(r[2:]) for r in rows]
+    if not params:
+        return 0
+    return db.connection().exec_driver_sql(_INSERT_TELEMETRY, params).rowcount
+
+def get_stored_timestamps(db: Session, ship_id: int, start: datetime, end: datetime):
+    # Timestamps already stored for a ship in [start, end], including archived days
+    stored = {t for (t,) in db.query(models.Telemetry.timestamp).filter(
+        models.Telemetry.ship_id == ship_id,
+        models.Telemetry.timestamp >= start,
+        models.Telemetry.timestamp <= end,
+    )}
+    for day, _ in archive.chunks_in_range(db, ship_id, start, end):
+        stored.update(r.timestamp for r in archive.load_chunk(db, ship_id, day, start, end))
+    return stored
+
+def get_fixes(db: Session, ship_id: int, start: datetime, end: datetime):
+    # (timestamp, latitude, longitude) of a ship in [start, end), raw and archived, oldest first
+    fixes = [tuple(r) for r in db.query(models.Telemetry.timestamp, models.Telemetry.latitude, models.Telemetry.longitude).filter(
+        models.Telemetry.ship_id == ship_id, models.Telemetry.timestamp >= start, models.Telemetry.timestamp < end
+    )]
+    last_included = end - timedelta(microseconds=1)  # load_chunk's end is inclusive
+    fixes += [
+        (r.timestamp, r.latitude, r.longitude)
+        for day, _ in archive.chunks_in_range(db, ship_id, start, last_included)
+        for r in archive.load_chunk(db, ship_id, day, start, last_included)
+    ]
+    return sorted(fixes, key=lambda f: f[0])
+
+def get_telemetry_id(db: Session, ship_id: int, timestamp: datetime):
+    telemetry_id = db.query(models.Telemetry.id).filter(
+        models.Telemetry.ship_id == ship_id, models.Telemetry.timestamp == timestamp
+    ).scalar()
+    if telemetry_id is None:
+        for day, _ in archive.chunks_in_range(db, ship_id, timestamp, timestamp):
+            for r in archive.load_chunk(db, ship_id, day, timestamp, timestamp):
+                return r.id
+    return telemetry_id
+
+def last_insert_id(db: Session):
+    return db.connection().exec_driver_sql("SELECT last_insert_rowid()").scalar()
+
+_TELEMETRY_ROW = (
+    models.Telemetry.id, models.Telemetry.ship_id, models.Telemetry.timestamp, models.Telemetry.rpm,
+    models.Telemetry.speed, models.Telemetry.fuel_consumption, models.Telemetry.latitude,
+    models.Telemetry.longitude, models.Telemetry.heading,
+)
 
 def get_telemetry(db: Session, ship_id: int, limit: int = 100, start_date: datetime = None, end_date: datetime = None):
-    query = db.query(models.Telemetry).filter(models.Telemetry.ship_id == ship_id)
-    
+    # Plain tuples in archive.TelemetryRow order (id, ship_id, timestamp, ...), newest first
+    query = select(*_TELEMETRY_ROW).where(models.Telemetry.ship_id == ship_id)
+
     if start_date:
-        query = query.filter(models.Telemetry.timestamp >= start_date)
+        query = query.where(models.Telemetry.timestamp >= start_date)
     if end_date:
-        query = query.filter(models.Telemetry.timestamp <= end_date)
-        
-    return query.order_by(models.Telemetry.timestamp.desc()).limit(limit).all()
+        query = query.where(models.Telemetry.timestamp <= end_date)
+
+    results = [tuple(r) for r in db.execute(query.order_by(models.Telemetry.timestamp.desc()).limit(limit))]
+
+    # Older days may live in the compressed archive; decode chunks newest-first
+    # only until they can no longer contribute to the newest `limit` samples.
+    for day, last_timestamp in archive.chunks_in_range(db, ship_id, start_date, end_date):
+        if len(results) >= limit and results[limit - 1][2] >= last_timestamp:
+            break
+        archived = archive.load_chunk(db, ship_id, day, start_date, end_date)
+        results = sorted(results + archived, key=lambda t: t[2], reverse=True)[:limit]
+    return results
+
+# Version tags for conditional GETs. Each is a single min()/max() lookup that
+# SQLite answers from an index edge, so it stays cheap however large the table grows.
+def get_telemetry_version(db: Session, ship_id: int):
+    oldest = db.query(func.min(models.Telemetry.id)).filter(models.Telemetry.ship_id == ship_id).scalar()
+    newest = db.query(func.max(models.Telemetry.id)).filter(models.Telemetry.ship_id == ship_id).scalar()
+    return oldest, newest
+
+def get_fleet_version(db: Session):
+    newest_ship = db.query(func.max(models.Ship.id)).scalar()
+    newest_telemetry = db.query(func.max(models.Telemetry.id)).scalar()
+    # Archiving moves rows without adding ids; the chunk table is one row per ship-day
+    chunks, archived = db.query(func.count(), func.sum(models.TelemetryChunk.samples)).select_from(models.TelemetryChunk).one()
+    return newest_ship, newest_telemetry, chunks, archived
+
+def get_latest_telemetry(db: Session, ship_id: int):
+    latest = db.query(models.Telemetry).filter(models.Telemetry.ship_id == ship_id).order_by(models.Telemetry.timestamp.desc()).first()
+    # A ship silent for longer than the archive horizon only has archived samples
+    newest_chunk = archive.chunks_in_range(db, ship_id)[:1]
+    for day, last_timestamp in newest_chunk:
+        if latest is None or last_timestamp > latest.timestamp:
+            latest = archive.load_chunk(db, ship_id, day)[-1]
+    return latest
 
 def get_ships_overview(db: Session):
     ships = db.query(models.Ship).all()
     results = []
     for ship in ships:
-        latest = db.query(models.Telemetry).filter(models.Telemetry.ship_id == ship.id).order_by(models.Telemetry.timestamp.desc()).first()
+        latest = get_latest_telemetry(db, ship.id)
         results.append({
             "id": ship.id,
             "name": ship.name,
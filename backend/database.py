@@ -1,12 +1,33 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from datetime import datetime
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///./sql_app.db"
 
+# Same text layout SQLAlchemy uses for DateTime on SQLite, so raw SQL parameters
+# sort and compare identically to ORM-written values.
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+def parse_timestamp(value):
+    # Raw text() queries hand back SQLite's stored timestamp strings
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value)
+
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
 )
+@event.listens_for(engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets readers proceed while a writer commits; busy_timeout makes
+    # competing writers wait for the lock instead of failing immediately.
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.close()
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
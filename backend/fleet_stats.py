@@ -0,0 +1,204 @@
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import threading
+import archive, models, rollups
+from database import TIMESTAMP_FORMAT, parse_timestamp
+
+# Fleet-wide statistics for a time window, cached per window. The first request
+# for a window aggregates it with one GROUP BY over raw telemetry plus one over
+# the hourly rollups (data already aged out or archived). Rollups only stand in
+# for hours that lie wholly inside the window; archived samples in a partial
+# hour at either edge are read back from their chunks. Later requests only
+# fold in rows with an id above the cached high-water mark, so a refresh costs
+# as much as the telemetry ingested since the previous call.
+
+IDLE_SPEED = 0.5  # knots
+ACTIVE_WITHIN = timedelta(minutes=15)
+CACHE_WINDOWS = 32
+
+_RAW_TOTALS = """
+    SELECT ship_id, COUNT(*), SUM(speed), SUM(fuel_consumption), MIN(timestamp), MAX(timestamp), MAX(id)
+    FROM telemetry WHERE {rows} AND timestamp >= :start AND timestamp < :end
+    GROUP BY ship_id
+"""
+# A lone MAX() makes SQLite return the other bare columns from that same row
+_RAW_LATEST = """
+    SELECT ship_id, MAX(timestamp), speed
+    FROM telemetry WHERE {rows} AND timestamp >= :start AND timestamp < :end
+    GROUP BY ship_id
+"""
+# First load seeks the (ship_id, timestamp) index once per ship; refreshes walk
+# the rowid range above the high-water mark instead.
+_FULL = "ship_id IN (SELECT id FROM ships) AND id <= :upto"
+_NEWER = "id > :after"
+_QUERIES = {
+    rows: (text(_RAW_TOTALS.format(rows=rows)), text(_RAW_LATEST.format(rows=rows)))
+    for rows in (_FULL, _NEWER)
+}
+
+_ROLLUPS = text("""
+    SELECT ship_id, SUM(samples), SUM(speed_sum), SUM(fuel_sum), MIN(first_timestamp), MAX(last_timestamp)
+    FROM telemetry_rollups
+    WHERE resolution = :resolution AND bucket >= :start AND bucket < :end
+    GROUP BY ship_id
+""")
+
+_EDGE_CHUNKS = text("""
+    SELECT ship_id, day FROM telemetry_chunks
+    WHERE last_timestamp >= :start AND first_timestamp < :end
+""")
+
+_FAR_FUTURE = datetime(9999, 1, 1)
+
+class _ShipTotals:
+    __slots__ = ("samples", "speed_sum", "fuel_sum", "first", "last", "last_speed")
+
+    def __init__(self):
+        self.samples = 0
+        self.speed_sum = 0.0
+        self.fuel_sum = 0.0
+        self.first = None
+        self.last = None
+        self.last_speed = None
+
+    def add(self, samples, speed_sum, fuel_sum, first, last):
+        self.samples += samples
+        self.speed_sum += speed_sum or 0.0
+        self.fuel_sum += fuel_sum or 0.0
+        if first is not None and (self.first is None or first < self.first):
+            self.first = first
+        if last is not None and (self.last is None or last > self.last):
+            self.last = last
+
+class _Window:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.after_id = None
+        self.ships = {}
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+def _window(start, end):
+    with _cache_lock:
+        window = _cache.get((start, end))
+        if window is None:
+            window = _cache[(start, end)] = _Window()
+            if len(_cache) > CACHE_WINDOWS:
+                _cache.popitem(last=False)
+        else:
+            _cache.move_to_end((start, end))
+        return window
+
+def _ceil_hour(value: datetime):
+    hour = rollups.floor_hour(value)
+    return hour if hour == value else hour + timedelta(hours=1)
+
+def _load_archived(db: Session, window: _Window, start: datetime, end: datetime):
+    # Hourly rollups for the whole hours inside [start, end), archived rows for the partial edge hours
+    full_start = _ceil_hour(start)
+    full_end = rollups.floor_hour(end) if end else _FAR_FUTURE
+    if full_start < full_end:
+        hourly = {
+            "resolution": rollups.HOUR,
+            "start": full_start.strftime(TIMESTAMP_FORMAT),
+            "end": full_end.strftime(TIMESTAMP_FORMAT),
+        }
+        for ship_id, samples, speed_sum, fuel_sum, first, last in db.execute(_ROLLUPS, hourly):
+            window.ships.setdefault(ship_id, _ShipTotals()).add(samples, speed_sum, fuel_sum, parse_timestamp(first), parse_timestamp(last))
+        edges = [(start, full_start), (full_end, end or _FAR_FUTURE)]
+    else:
+        edges = [(start, end or _FAR_FUTURE)]
+    for edge_start, edge_end in edges:
+        if edge_start >= edge_end:
+            continue
+        bounds = {"start": edge_start.strftime(TIMESTAMP_FORMAT), "end": edge_end.strftime(TIMESTAMP_FORMAT)}
+        for ship_id, day in db.execute(_EDGE_CHUNKS, bounds).all():
+            # load_chunk's end is inclusive
+            rows = archive.load_chunk(db, ship_id, parse_timestamp(day), edge_start, edge_end - timedelta(microseconds=1))
+            if rows:
+                window.ships.setdefault(ship_id, _ShipTotals()).add(
+                    len(rows),
+                    sum(r.speed for r in rows if r.speed is not None),
+                    sum(r.fuel_consumption for r in rows if r.fuel_consumption is not None),
+                    rows[0].timestamp,
+                    rows[-1].timestamp,
+                )
+
+def _refresh(db: Session, window: _Window, start: datetime, end: datetime):
+    params = {
+        "after": window.after_id,
+        "start": start.strftime(TIMESTAMP_FORMAT),
+        "end": (end or _FAR_FUTURE).strftime(TIMESTAMP_FORMAT),
+    }
+    if window.after_id is None:
+        # Pin the high-water mark first so rows landing mid-load are picked up by the next refresh
+        params["upto"] = window.after_id = db.execute(text("SELECT COALESCE(MAX(id), 0) FROM telemetry")).scalar()
+        totals_query, latest_query = _QUERIES[_FULL]
+        _load_archived(db, window, start, end)
+    else:
+        totals_query, latest_query = _QUERIES[_NEWER]
+    newest = window.after_id
+    for ship_id, samples, speed_sum, fuel_sum, first, last, max_id in db.execute(totals_query, params):
+        window.ships.setdefault(ship_id, _ShipTotals()).add(samples, speed_sum, fuel_sum, parse_timestamp(first), parse_timestamp(last))
+        newest = max(newest, max_id)
+    for ship_id, last, speed in db.execute(latest_query, params):
+        totals = window.ships[ship_id]
+        if parse_timestamp(last) >= totals.last:
+            totals.last_speed = speed
+    window.after_id = newest
+
+def get_fleet_stats(db: Session, start: datetime, end: datetime = None):
+    window = _window(start, end)
+    with window.lock:
+        try:
+            _refresh(db, window, start, end)
+        except Exception:
+            # Never keep half-applied totals around
+            window.after_id = None
+            window.ships = {}
+            raise
+        totals = {ship_id: (t.samples, t.speed_sum, t.fuel_sum, t.first, t.last, t.last_speed)
+                  for ship_id, t in window.ships.items()}
+
+    reference = min(end, datetime.utcnow()) if end else datetime.utcnow()
+    ships = []
+    for ship in db.query(models.Ship).order_by(models.Ship.id).all():
+        samples, speed_sum, fuel_sum, first, last, last_speed = totals.get(ship.id, (0, 0.0, 0.0, None, None, None))
+        if not samples:
+            status = "offline"
+        elif last_speed is not None and last_speed > IDLE_SPEED and reference - last <= ACTIVE_WITHIN:
+            status = "active"
+        else:
+            status = "idle"
+        avg_fuel = fuel_sum / samples if samples else None
+        hours = (last - first).total_seconds() / 3600 if samples else 0.0
+        ships.append({
+            "ship_id": ship.id,
+            "mmsi": ship.mmsi,
+            "name": ship.name,
+            "samples": samples,
+            "avg_speed": speed_sum / samples if samples else None,
+            "avg_fuel_consumption": avg_fuel,
+            # fuel_consumption is a rate (L/h): mean rate over the covered time span
+            "fuel_burned": avg_fuel * hours if samples else 0.0,
+            "first_timestamp": first,
+            "last_timestamp": last,
+            "last_speed": last_speed,
+            "status": status,
+        })
+
+    samples = sum(s["samples"] for s in ships)
+    return {
+        "start": start,
+        "end": end,
+        "ships": ships,
+        "total_samples": samples,
+        "total_fuel_burned": sum(s["fuel_burned"] for s in ships),
+        "avg_speed": sum(totals[s["ship_id"]][1] for s in ships if s["samples"]) / samples if samples else None,
+        "active": sum(1 for s in ships if s["status"] == "active"),
+        "idle": sum(1 for s in ships if s["status"] == "idle"),
+        "offline": sum(1 for s in ships if s["status"] == "offline"),
+    }
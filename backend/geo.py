@@ -0,0 +1,79 @@
+import math
+
+# Geohash encoding and great-circle distance, shared by the heatmap bins and
+# the spatial index.
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_DECODE = {c: i for i, c in enumerate(_BASE32)}
+EARTH_RADIUS_KM = 6371.0088
+
+def valid(lat, lon):
+    return lat is not None and lon is not None and -90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0
+
+def encode(lat: float, lon: float, precision: int):
+    lat_lo, lat_hi, lon_lo, lon_hi = -90.0, 90.0, -180.0, 180.0
+    chars = []
+    bits = value = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if lon >= mid:
+                value = value * 2 + 1
+                lon_lo = mid
+            else:
+                value *= 2
+                lon_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                value = value * 2 + 1
+                lat_lo = mid
+            else:
+                value *= 2
+                lat_hi = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits = value = 0
+    return "".join(chars)
+
+def _split(value, lon_first):
+    # The 5 bits of one character alternate lon/lat, starting with lon on even positions
+    lon = lat = 0
+    for shift in range(4, -1, -1):
+        bit = (value >> shift) & 1
+        if (shift % 2 == 0) == lon_first:
+            lon = lon * 2 + bit
+        else:
+            lat = lat * 2 + bit
+    return lon, lat
+
+_PARTS = [[_split(_DECODE[c], lon_first) for c in _BASE32] for lon_first in (False, True)]
+
+def bounds(geohash: str):
+    # (lat_min, lat_max, lon_min, lon_max) of the cell
+    lon = lat = lon_bits = lat_bits = 0
+    for i, char in enumerate(geohash):
+        even = i % 2 == 0
+        lon_part, lat_part = _PARTS[even][_DECODE[char]]
+        lon_width, lat_width = (3, 2) if even else (2, 3)
+        lon = (lon << lon_width) | lon_part
+        lat = (lat << lat_width) | lat_part
+        lon_bits += lon_width
+        lat_bits += lat_width
+    lon_step = 360.0 / (1 << lon_bits)
+    lat_step = 180.0 / (1 << lat_bits)
+    return -90.0 + lat * lat_step, -90.0 + (lat + 1) * lat_step, -180.0 + lon * lon_step, -180.0 + (lon + 1) * lon_step
+
+def center(geohash: str):
+    lat_lo, lat_hi, lon_lo, lon_hi = bounds(geohash)
+    return (lat_lo + lat_hi) / 2, (lon_lo + lon_hi) / 2
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
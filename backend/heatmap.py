@@ -0,0 +1,152 @@
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+import argparse
+import crud, geo, migrations, models, rollups
+from database import SessionLocal, engine, TIMESTAMP_FORMAT
+
+# Fleet density heatmap. Every stored fix adds one sample to its geohash cell
+# for the UTC day, at each precision in PRECISIONS, and the time until the
+# ship's next fix (capped at MAX_GAP, so outages don't count) is added to the
+# cell of the earlier fix as dwell time. Bins are maintained at ingest in the
+# same transaction as the telemetry rows, so a month-wide fleet heatmap is a
+# read of a few thousand pre-aggregated rows. Coarser precisions than the
+# stored ones are produced by grouping on a geohash prefix.
+#
+#   python heatmap.py --rebuild --days 30   # (re)build bins from stored history
+
+PRECISIONS = (3, 4, 5, 6)
+MAX_GAP = timedelta(minutes=10)
+MAX_RESPONSE_CELLS = 50000
+
+_UPSERT = (
+    "INSERT INTO heatmap_bins (precision, day, geohash, samples, dwell_seconds) VALUES (?, ?, ?, ?, ?) "
+    "ON CONFLICT (precision, day, geohash) DO UPDATE SET "
+    "samples = samples + excluded.samples, dwell_seconds = dwell_seconds + excluded.dwell_seconds"
+)
+
+_CELLS = text("""
+    SELECT substr(geohash, 1, :precision) AS cell, SUM(samples), SUM(dwell_seconds)
+    FROM heatmap_bins
+    WHERE precision = :stored AND day >= :start AND day < :end
+    GROUP BY cell
+    ORDER BY 2 DESC
+    LIMIT :limit
+""")
+
+def _track(fixes):
+    # (timestamp, cell) of the fixes with a usable position
+    return [(timestamp, geo.encode(lat, lon, PRECISIONS[-1])) for timestamp, lat, lon in fixes if geo.valid(lat, lon)]
+
+def _add_dwell(bins, track, sign=1):
+    # track oldest first: the time until each next fix goes to the earlier fix's cell
+    for (timestamp, cell), (next_timestamp, _) in zip(track, track[1:]):
+        gap = next_timestamp - timestamp
+        if timedelta(0) < gap <= MAX_GAP:
+            bins.setdefault((rollups.floor_day(timestamp), cell), [0, 0.0])[1] += sign * gap.total_seconds()
+
+def _add_samples(bins, track):
+    for timestamp, cell in track:
+        bins.setdefault((rollups.floor_day(timestamp), cell), [0, 0.0])[0] += 1
+
+def _accumulate(bins, fixes):
+    # fixes: (timestamp, lat, lon) of one ship, oldest first
+    track = _track(fixes)
+    _add_samples(bins, track)
+    _add_dwell(bins, track)
+
+def _write(db: Session, bins):
+    params = [
+        (precision, day.strftime(TIMESTAMP_FORMAT), cell[:precision], samples, dwell)
+        for (day, cell), (samples, dwell) in bins.items()
+        for precision in PRECISIONS
+    ]
+    if params:
+        db.connection().exec_driver_sql(_UPSERT, params)
+
+def process_rows(db: Session, rows):
+    # rows in crud.TELEMETRY_COLUMNS order, not stored yet; call before inserting them.
+    # New fixes may land before or between stored ones (late samples, replayed
+    # backlogs), so the dwell of the stored fixes around the batch is taken out
+    # and the merged track's dwell added back. For the usual in-order upload
+    # that is just the last stored fix before the batch.
+    by_ship = {}
+    for ship_id, timestamp, _, _, _, lat, lon, _ in rows:
+        by_ship.setdefault(ship_id, []).append((timestamp, lat, lon))
+    bins = {}
+    for ship_id, fixes in by_ship.items():
+        new = _track(sorted(fixes, key=lambda f: f[0]))
+        if not new:
+            continue
+        # Stored fixes near the batch: only gaps up to MAX_GAP carry dwell, so
+        # fixes further than that from every new fix can't change
+        nearby = crud.get_fixes(db, ship_id, new[0][0] - MAX_GAP, new[-1][0] + MAX_GAP + timedelta(microseconds=1))
+        stored = _track(nearby)
+        _add_samples(bins, new)
+        _add_dwell(bins, stored, -1)
+        _add_dwell(bins, sorted(stored + new, key=lambda f: f[0]))
+    _write(db, bins)
+
+def get_heatmap(db: Session, precision: int, start: datetime, end: datetime):
+    # Whole UTC days covering [start, end)
+    stored = max(precision, PRECISIONS[0])
+    start_day = rollups.floor_day(start)
+    end_day = rollups.floor_day(end - timedelta(microseconds=1)) + timedelta(days=1)
+    result = db.execute(_CELLS, {
+        "precision": precision,
+        "stored": stored,
+        "start": start_day.strftime(TIMESTAMP_FORMAT),
+        "end": end_day.strftime(TIMESTAMP_FORMAT),
+        "limit": MAX_RESPONSE_CELLS,
+    })
+    cells = []
+    for cell, samples, dwell in result:
+        lat_min, lat_max, lon_min, lon_max = geo.bounds(cell)
+        cells.append({
+            "geohash": cell,
+            "lat": (lat_min + lat_max) / 2,
+            "lon": (lon_min + lon_max) / 2,
+            "bounds": [lat_min, lon_min, lat_max, lon_max],
+            "samples": samples,
+            "dwell_seconds": dwell,
+        })
+    return {"precision": precision, "start": start_day, "end": end_day, "cells": cells}
+
+def rebuild(db: Session, start: datetime, end: datetime, log=print):
+    # Recomputes whole days from raw and archived telemetry, one ship at a time.
+    # Bins are fleet-wide, so a day where any ship has samples that retention
+    # reduced to rollups can't be recomputed and keeps the bins it has.
+    start, end = rollups.floor_day(start), rollups.floor_day(end) + timedelta(days=1)
+    aged = {day for _, day in rollups.aged_days(db, start, end)}
+    if aged:
+        log(f"Keeping {len(aged)} days partly aged out by retention")
+    for range_start, range_end in rollups.day_ranges(start, end, aged):
+        db.query(models.HeatmapBin).filter(models.HeatmapBin.day >= range_start, models.HeatmapBin.day < range_end).delete()
+    bins = {}
+    for ship in db.query(models.Ship).order_by(models.Ship.id).all():
+        fixes = crud.get_fixes(db, ship.id, start, end)
+        _accumulate(bins, fixes)
+        log(f"{ship.mmsi}: {len(fixes)} fixes")
+    _write(db, {key: value for key, value in bins.items() if key[0] not in aged})
+    db.commit()
+    return len(bins)
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the fleet density heatmap bins")
+    parser.add_argument("--rebuild", action="store_true", help="recompute bins from stored telemetry")
+    parser.add_argument("--days", type=int, default=30, help="how many days back to rebuild")
+    args = parser.parse_args()
+    if not args.rebuild:
+        parser.error("nothing to do (use --rebuild)")
+
+    migrations.run(engine)
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        cells = rebuild(db, now - timedelta(days=args.days), now)
+        print(f"Rebuilt {cells} day-cells")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
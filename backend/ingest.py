@@ -0,0 +1,71 @@
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+import anomaly, crud, heatmap, live, schemas, spatial
+
+def resolve_ships(db: Session, mmsis):
+    # Map MMSI -> ship id, auto-creating unknown ships like the single-sample endpoint does
+    ships = crud.get_ships_by_mmsi(db, mmsis)
+    for mmsi in set(mmsis) - set(ships):
+        try:
+            ships[mmsi] = crud.create_ship(db=db, ship=schemas.ShipCreate(name=f"Ship {mmsi}", mmsi=mmsi))
+        except IntegrityError:
+            # Another worker registered it first
+            db.rollback()
+            ships[mmsi] = crud.get_ship(db, mmsi=mmsi)
+    return {mmsi: ship.id for mmsi, ship in ships.items()}
+
+def rows_from_records(db: Session, records):
+    # records: (mmsi, timestamp or None, rpm, speed, fuel_consumption, latitude, longitude, heading)
+    ship_ids = resolve_ships(db, {r[0] for r in records})
+    now = datetime.utcnow()
+    # Samples without a device time get server time, one microsecond apart in
+    # batch order, so deduplication doesn't take them for repeats of each other
+    return [
+        (
+            ship_ids[mmsi], crud.to_utc_naive(timestamp) if timestamp else now + timedelta(microseconds=n),
+            rpm, speed, fuel, lat, lon, heading if heading is not None else 0.0,
+        )
+        for n, (mmsi, timestamp, rpm, speed, fuel, lat, lon, heading) in enumerate(records)
+    ]
+
+def new_rows(db: Session, rows):
+    # Drops samples that are already stored (retried requests, replayed
+    # backlogs) or repeated within the batch, so derived data (alerts, heatmap,
+    # aggregates) only ever sees each sample once. One index range scan per ship.
+    by_ship = {}
+    for row in rows:
+        by_ship.setdefault(row[0], []).append(row)
+    fresh = []
+    for ship_id, ship_rows in by_ship.items():
+        timestamps = [row[1] for row in ship_rows]
+        seen = crud.get_stored_timestamps(db, ship_id, min(timestamps), max(timestamps))
+        for row in ship_rows:
+            if row[1] not in seen:
+                seen.add(row[1])
+                fresh.append(row)
+    return fresh
+
+def store_rows(db: Session, rows):
+    # Inserts without committing, so the dedicated writer can group many
+    # requests into one transaction
+    rows = new_rows(db, rows)
+    alerts = anomaly.process_rows(db, rows)
+    heatmap.process_rows(db, rows)
+    spatial.process_rows(db, rows)
+    inserted = crud.insert_telemetry_rows(db, rows)
+    # "rows" (what was actually stored) stays in-process; the writer strips it from replies
+    return {"inserted": inserted, "last_id": crud.last_insert_id(db) if inserted else None, "alerts": alerts, "rows": rows}
+
+def write_rows(db: Session, rows):
+    # Single transaction per batch: one fsync instead of one per sample
+    try:
+        result = store_rows(db, rows)
+        pending = live.prepare(db, result.pop("rows"), result)
+        db.commit()
+    except Exception:
+        db.rollback()
+        anomaly.discard({row[0] for row in rows})
+        raise
+    live.apply(pending)
+    return result
@@ -0,0 +1,27 @@
+import importlib
+import importlib.util
+
+# Deferred imports for heavy or optional modules (NumPy, msgpack, zstandard).
+# The stand-in imports the real module on first attribute access, so an API
+# worker only pays for it when a request actually needs it.
+# importlib.import_module holds the module lock, so concurrent first uses from
+# request threads are safe.
+
+class _Module:
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        value = getattr(self._module, attr)
+        setattr(self, attr, value)  # later lookups skip __getattr__
+        return value
+
+def load(name, optional=False):
+    # optional=True returns None when the module isn't installed, like the
+    # try/except ImportError pattern it replaces
+    if optional and importlib.util.find_spec(name) is None:
+        return None
+    return _Module(name)
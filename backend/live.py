@@ -0,0 +1,209 @@
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from array import array
+from datetime import datetime, timedelta
+import sys
+import threading
+import crud, models
+from database import parse_timestamp
+
+# Recent samples per ship kept in memory for live views. Each ship gets a
+# fixed-capacity ring of typed arrays (id, epoch microseconds, 6 floats: 64
+# bytes per sample), ordered by timestamp, holding every stored sample newer
+# than its oldest entry. Rings are fed by this process's ingest and checked
+# against the ship's telemetry version (min/max id) that the GET endpoint
+# already reads for its ETag: when another process has written (dedicated
+# writer, other workers) only the missing ids are fetched, and deletions by
+# retention/archive force a reload.
+
+RING_SIZE = 256
+FLOAT_COLUMNS = ("rpm", "speed", "fuel_consumption", "latitude", "longitude", "heading")
+
+_EPOCH = datetime(1970, 1, 1)
+_NAN = float("nan")
+
+_NEWER = text("""
+    SELECT id, ship_id, timestamp, rpm, speed, fuel_consumption, latitude, longitude, heading
+    FROM telemetry WHERE ship_id = :ship_id AND id > :after ORDER BY id DESC LIMIT :limit
+""")
+_PREVIOUS_ID = text("SELECT MAX(id) FROM telemetry WHERE ship_id = :ship_id AND id < :first_id")
+
+def _micros(value: datetime):
+    return (value - _EPOCH) // timedelta(microseconds=1)
+
+class Ring:
+    __slots__ = ("ship_id", "size", "count", "head", "ids", "micros", "values", "version", "complete")
+
+    def __init__(self, ship_id, size=RING_SIZE):
+        self.ship_id = ship_id
+        self.size = size
+        self.count = 0
+        self.head = 0  # slot of the next write; the oldest sample once the ring is full
+        self.ids = array("q", bytes(8 * size))
+        self.micros = array("q", bytes(8 * size))
+        self.values = array("d", bytes(8 * size * len(FLOAT_COLUMNS)))
+        self.version = None  # (min id, max id) of the ship's telemetry this ring reflects
+        self.complete = False  # holds the ship's whole history
+
+    def nbytes(self):
+        return sys.getsizeof(self.ids) + sys.getsizeof(self.micros) + sys.getsizeof(self.values)
+
+    def _slot(self, i):
+        # i-th oldest sample
+        return (self.head - self.count + i) % self.size
+
+    def _write(self, id, micros, floats):
+        slot = self.head
+        self.ids[slot] = id
+        self.micros[slot] = micros
+        base = slot * len(FLOAT_COLUMNS)
+        for offset, value in enumerate(floats):
+            self.values[base + offset] = _NAN if value is None else value
+        self.head = (slot + 1) % self.size
+        if self.count < self.size:
+            self.count += 1
+        else:
+            self.complete = False
+
+    def add(self, row):
+        # row: (id, ship_id, timestamp, 6 floats)
+        micros = _micros(row[2])
+        if self.count == 0 or micros > self.micros[self._slot(self.count - 1)]:
+            self._write(row[0], micros, row[3:])
+            return
+        # Late sample: keep the ring sorted by rebuilding it (rare)
+        rows = self.rows()
+        if row[2] < rows[0][2] and not self.complete:
+            return  # older than everything kept; the "all samples since oldest" invariant still holds
+        self.load(sorted(rows + [tuple(row)], key=lambda r: r[2]), self.complete)
+
+    def load(self, rows, complete):
+        # rows oldest first
+        self.count = self.head = 0
+        self.complete = complete
+        for row in rows[-self.size:]:
+            self._write(row[0], _micros(row[2]), row[3:])
+        if len(rows) > self.size:
+            self.complete = False
+
+    def _row(self, slot):
+        width = len(FLOAT_COLUMNS)
+        floats = [None if v != v else v for v in self.values[slot * width:(slot + 1) * width]]
+        return (self.ids[slot], self.ship_id, _EPOCH + timedelta(microseconds=self.micros[slot]), *floats)
+
+    def rows(self):
+        # Tuples in archive.TelemetryRow order, oldest first
+        return [self._row(self._slot(i)) for i in range(self.count)]
+
+    def query(self, limit, start=None, end=None):
+        # Newest first, or None when samples outside the ring could be part of the answer
+        if self.count == 0 and not self.complete:
+            return None
+        if limit <= 0:
+            return []
+        start_us = _micros(start) if start else None
+        end_us = _micros(end) if end else None
+        result = []
+        for i in range(self.count - 1, -1, -1):
+            slot = self._slot(i)
+            micros = self.micros[slot]
+            if end_us is not None and micros > end_us:
+                continue
+            if start_us is not None and micros < start_us:
+                return result
+            result.append(self._row(slot))
+            if len(result) == limit:
+                return result
+        if self.complete or (start_us is not None and self.count and start_us >= self.micros[self._slot(0)]):
+            return result
+        return None
+
+_rings = {}
+_lock = threading.Lock()
+
+def _reload(db: Session, ring: Ring, version):
+    rows = crud.get_telemetry(db, ring.ship_id, limit=ring.size)
+    has_archive = db.query(models.TelemetryChunk.day).filter(models.TelemetryChunk.ship_id == ring.ship_id).first() is not None
+    ring.load(rows[::-1], complete=len(rows) < ring.size and not has_archive)
+    ring.version = version
+
+def _sync(db: Session, ring: Ring, version):
+    if ring.version == version:
+        return
+    if ring.version is not None and ring.version[0] == version[0] and ring.version[1] is not None:
+        # Only new rows since the last sync; ids are committed in increasing order
+        newer = db.execute(_NEWER, {"ship_id": ring.ship_id, "after": ring.version[1], "limit": ring.size + 1}).all()
+        if len(newer) <= ring.size:
+            for row in reversed(newer):
+                ring.add((row[0], row[1], parse_timestamp(row[2]), *row[3:]))
+            ring.version = version
+            return
+    _reload(db, ring, version)
+
+def get_recent(db: Session, ship_id: int, version, limit: int, start: datetime = None, end: datetime = None):
+    # version: crud.get_telemetry_version(db, ship_id); returns None when the
+    # request has to go to SQL
+    if limit > RING_SIZE:
+        return None
+    start = crud.to_utc_naive(start) if start else None
+    end = crud.to_utc_naive(end) if end else None
+    with _lock:
+        ring = _rings.get(ship_id)
+        if ring is None:
+            ring = _rings[ship_id] = Ring(ship_id)
+        _sync(db, ring, tuple(version))
+        return ring.query(limit, start, end)
+
+def prepare(db: Session, rows, result):
+    # Called inside the ingest transaction after the insert: notes, per ship,
+    # the newest id stored before this batch so the rings can tell whether
+    # they have seen everything up to it
+    if not result["inserted"] or result["inserted"] != len(rows):
+        return {"stale": {row[0] for row in rows}}
+    first_id = result["last_id"] - len(rows) + 1
+    by_ship = {}
+    for offset, row in enumerate(rows):
+        by_ship.setdefault(row[0], []).append((first_id + offset, *row))
+    previous = {
+        ship_id: db.execute(_PREVIOUS_ID, {"ship_id": ship_id, "first_id": first_id}).scalar()
+        for ship_id in by_ship
+    }
+    return {"rows": by_ship, "previous": previous}
+
+def apply(pending):
+    # After commit: feed the rings that were current, drop the others
+    with _lock:
+        for ship_id in pending.get("stale", ()):
+            _rings.pop(ship_id, None)
+        for ship_id, rows in pending.get("rows", {}).items():
+            ring = _rings.get(ship_id)
+            if ring is None:
+                continue
+            if ring.version is None or ring.version[1] != pending["previous"][ship_id]:
+                _rings.pop(ship_id)
+                continue
+            for row in rows:
+                ring.add(row)
+            ring.version = (ring.version[0] or rows[0][0], rows[-1][0])
+
+def warm(db: Session):
+    # Runs in the background while requests are served: rings that a request
+    # has already built are left alone
+    for (ship_id,) in db.query(models.Ship.id).order_by(models.Ship.id).all():
+        with _lock:
+            if ship_id in _rings:
+                continue
+            ring = _rings[ship_id] = Ring(ship_id)
+            _reload(db, ring, crud.get_telemetry_version(db, ship_id))
+
+def stats():
+    with _lock:
+        rings = list(_rings.values())
+    total = sum(ring.nbytes() for ring in rings)
+    return {
+        "ships": len(rings),
+        "ring_size": RING_SIZE,
+        "samples": sum(ring.count for ring in rings),
+        "bytes_per_ship": Ring(0).nbytes(),
+        "total_bytes": total,
+    }
@@ -1,16 +1,26 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Request, Response, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from sqlalchemy.orm import Session
 from datetime import timedelta, datetime
 from typing import List
+from pydantic import TypeAdapter
+from contextlib import asynccontextmanager
 from jose import JWTError, jwt
-import models, schemas, crud, database
+import hashlib
+import os
+import schemas, crud, database, anomaly, coalesce, fleet_stats, geo, heatmap, ingest, live, reports, serialize, series, spatial, startup, wire, writer
 from database import engine
 
-models.Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Schema first, then serve while the live rings fill in the background (see startup.py)
+    startup.run_migrations(engine)
+    startup.start_warm()
+    yield
 
-app = FastAPI(title="Ship Management API")
+app = FastAPI(title="Ship Management API", lifespan=lifespan)
 
 # Setup CORS
 app.add_middleware(
@@ -19,7 +29,9 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
+app.add_middleware(GZipMiddleware, minimum_size=1024)
 
 # Auth Config
 SECRET_KEY = "SECRET_KEY_GOES_HERE_CHANGE_IN_PROD"
@@ -64,10 +76,28 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         raise credentials_exception
     return user
 
+# Conditional GET support: dashboards poll every few seconds, so endpoints tag
+# responses with a version derived from the newest telemetry id and answer
+# If-None-Match with 304 before running the real query.
+def make_etag(*parts):
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=8).hexdigest()
+    return f'W/"{digest}"'
+
+def not_modified(request: Request, response: Response, etag: str):
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return None
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    if etag in tags or "*" in tags:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=dict(response.headers))
+    return None
+
 @app.post("/token", response_model=dict)
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     user = crud.get_user(db, username=form_data.username)
-    if not user or not crud.pwd_context.verify(form_data.password, user.hashed_password):
+    if not user or not crud.get_pwd_context().verify(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -102,9 +132,48 @@ def create_ship(ship: schemas.ShipCreate, db: Session = Depends(get_db), current
 def read_ships(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: schemas.User = Depends(get_current_user)):
     return crud.get_all_ships(db, skip=skip, limit=limit)
 
+_OVERVIEW = TypeAdapter(List[schemas.ShipWithTelemetry])
+
 @app.get("/ships/overview", response_model=List[schemas.ShipWithTelemetry])
-def read_ships_overview(db: Session = Depends(get_db), current_user: schemas.User = Depends(get_current_user)):
-    return crud.get_ships_overview(db)
+def read_ships_overview(request: Request, response: Response, db: Session = Depends(get_db), current_user: schemas.User = Depends(get_current_user)):
+    etag = make_etag("overview", *crud.get_fleet_version(db))
+    cached = not_modified(request, response, etag)
+    if cached:
+        return cached
+    # Every open dashboard polls this; concurrent pollers share one query and encoding
+    body = coalesce.get(
+        ("overview", etag),
+        lambda: _OVERVIEW.dump_json(_OVERVIEW.validate_python(crud.get_ships_overview(db), from_attributes=True)),
+        tags=(coalesce.FLEET,),
+    )
+    return serialize.json_response(body, response)
+
+# In multi-worker deployments (SHIP_WRITER_SOCKET set) rows go to the dedicated
+# writer process instead of being committed by this worker.
+writer_client = writer.WriterClient(writer.socket_path()) if writer.socket_path() else None
+
+def store_telemetry(db: Session, rows):
+    try:
+        if writer_client is None:
+            return ingest.write_rows(db, rows)
+        try:
+            return writer_client.write(rows)
+        except writer.WriterUnavailable as e:
+            raise HTTPException(status_code=503, detail=f"Telemetry writer unavailable: {e}")
+    finally:
+        coalesce.invalidate({row[0] for row in rows})
+
+async def read_body(request: Request):
+    return wire.decompress(await request.body(), request.headers.get("content-encoding"))
+
+@app.post("/telemetry/batch")
+def create_telemetry_batch(request: Request, body: bytes = Depends(read_body), db: Session = Depends(get_db)):
+    # Bulk upload for edge spools draining a backlog. Accepts JSON, MessagePack or
+    # the packed binary layout (see wire.py), optionally gzip/zstd-compressed.
+    records = wire.decode(request.headers.get("content-type"), body)
+    rows = ingest.rows_from_records(db, records)
+    result = store_telemetry(db, rows)
+    return {"received": len(records), "inserted": result["inserted"], "alerts": result["alerts"]}
 
 @app.post("/telemetry/{mmsi}", response_model=schemas.Telemetry)
 def create_telemetry(mmsi: str, telemetry: schemas.TelemetryCreate, db: Session = Depends(get_db)):
@@ -112,24 +181,226 @@ def create_telemetry(mmsi: str, telemetry: schemas.TelemetryCreate, db: Session
     # No Auth for simplicity for data ingestion? Or should we require api key?
     # For this demo, let's keep it open or require a token if simulator can send it.
     # Let's keep it open but use implicit ship creation.
-    ship = crud.get_ship(db, mmsi=mmsi)
-    if not ship:
-        # Auto-create ship if not exists? Or error?
-        # Let's auto-create for easier testing
-        ship = crud.create_ship(db=db, ship=schemas.ShipCreate(name=f"Ship {mmsi}", mmsi=mmsi))
-    
-    return crud.create_telemetry(db=db, telemetry=telemetry, ship_id=ship.id)
+    ship_id = ingest.resolve_ships(db, [mmsi])[mmsi]
+    timestamp = crud.to_utc_naive(telemetry.timestamp) if telemetry.timestamp else datetime.utcnow()
+    row = (ship_id, timestamp, telemetry.rpm, telemetry.speed, telemetry.fuel_consumption,
+           telemetry.latitude, telemetry.longitude, telemetry.heading)
+    result = store_telemetry(db, [row])
+    # A retried sample is not stored twice; answer with the row that already exists
+    telemetry_id = result["last_id"] if result["inserted"] else crud.get_telemetry_id(db, ship_id, timestamp)
+    return {"id": telemetry_id, **dict(zip(crud.TELEMETRY_COLUMNS, row))}
+
+@app.get("/telemetry", response_model=schemas.TelemetrySeries)
+def get_telemetry_series(
+    mmsi: str,
+    request: Request,
+    response: Response,
+    start_date: datetime = None,
+    end_date: datetime = None,
+    bucket: int = 3600,
+    format: str = "rows",
+    fill: str = "none",
+    db: Session = Depends(get_db),
+    current_user: schemas.User = Depends(get_current_user)
+):
+    # Several ships in one request (?mmsi=a,b,c), averaged on a shared grid of
+    # `bucket`-second buckets; defaults to the last 24 hours.
+    # format=columnar returns the time axis as epoch milliseconds;
+    # fill=previous rebuilds step-wise series from deadband (sparse) senders
+    if format not in ("rows", "columnar"):
+        raise HTTPException(status_code=400, detail="format must be rows or columnar")
+    if fill not in series.FILLS:
+        raise HTTPException(status_code=400, detail=f"fill must be one of {', '.join(series.FILLS)}")
+    mmsis = list(dict.fromkeys(m.strip() for m in mmsi.split(",") if m.strip()))
+    ships = crud.get_ships_by_mmsi(db, mmsis)
+    missing = [m for m in mmsis if m not in ships]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Ship not found: {', '.join(missing)}")
+    if not mmsis:
+        raise HTTPException(status_code=400, detail="mmsi is required")
+    end_date = crud.to_utc_naive(end_date) if end_date else datetime.utcnow()
+    start_date = crud.to_utc_naive(start_date) if start_date else end_date - timedelta(days=1)
+    if bucket <= 0 or start_date >= end_date:
+        raise HTTPException(status_code=400, detail="Invalid bucket or time range")
+    if series.grid(start_date, end_date, bucket)[1] > series.MAX_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"Too many buckets (max {series.MAX_BUCKETS}); use a wider bucket")
+    ships = [ships[m] for m in mmsis]
+    versions = [crud.get_telemetry_version(db, ship.id) for ship in ships]
+    etag = make_etag("series", [ship.id for ship in ships], versions, start_date, end_date, bucket, format, fill)
+    cached = not_modified(request, response, etag)
+    if cached:
+        return cached
+    result = series.get_series(db, ships, start_date, end_date, bucket, fill)
+    if format == "columnar":
+        # Series are already one array per field; only the time axis changes to epoch ms
+        result["timestamps"] = [serialize.epoch_ms(t) for t in result["timestamps"]]
+        return serialize.json_response(serialize.dumps(result), response)
+    return result
 
 @app.get("/telemetry/{mmsi}", response_model=List[schemas.Telemetry])
 def get_telemetry(
     mmsi: str, 
+    request: Request,
+    response: Response,
     limit: int = 100, 
     start_date: datetime = None, 
     end_date: datetime = None, 
+    format: str = "rows",
     db: Session = Depends(get_db), 
     current_user: schemas.User = Depends(get_current_user)
 ):
+    # format=rows (objects), columnar (one array per field) or binary (see serialize.py)
+    if format not in serialize.FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(serialize.FORMATS)}")
+    if limit < 0:
+        raise HTTPException(status_code=400, detail="limit must not be negative")
     ship = crud.get_ship(db, mmsi=mmsi)
     if not ship:
         raise HTTPException(status_code=404, detail="Ship not found")
-    return crud.get_telemetry(db=db, ship_id=ship.id, limit=limit, start_date=start_date, end_date=end_date)
+    start_date = crud.to_utc_naive(start_date) if start_date else None
+    end_date = crud.to_utc_naive(end_date) if end_date else None
+    version = crud.get_telemetry_version(db, ship.id)
+    etag = make_etag("telemetry", ship.id, *version, limit, start_date, end_date, format)
+    cached = not_modified(request, response, etag)
+    if cached:
+        return cached
+    # Recent windows come from the in-memory ring; longer ones fall back to SQL.
+    # Column tuples are encoded directly; response_model only documents the shape here
+    def load():
+        rows = live.get_recent(db, ship.id, version, limit, start_date, end_date)
+        if rows is None:
+            rows = crud.get_telemetry(db=db, ship_id=ship.id, limit=limit, start_date=start_date, end_date=end_date)
+        return serialize.telemetry_body(rows, format)
+    # Operators watching the same ship share one read of the live window; the
+    # ETag covers the ship's version and the parameters, so it doubles as the
+    # coalescing key. Large history reads are one-off and go straight through.
+    if limit > live.RING_SIZE:
+        body, media_type = load()
+    else:
+        body, media_type = coalesce.get(("telemetry", etag), load, tags=(ship.id,))
+    return serialize.content_response(body, media_type, response)
+
+@app.get("/ready", response_model=schemas.Readiness)
+def read_ready(response: Response):
+    # Readiness probe for load balancers/orchestrators: 503 until the schema is
+    # migrated and the live rings are warm; no auth so probes can call it
+    ready, report = startup.readiness()
+    if not ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return report
+
+@app.get("/live/stats", response_model=schemas.LiveStats)
+def read_live_stats(current_user: schemas.User = Depends(get_current_user)):
+    return live.stats()
+
+@app.get("/fleet/stats", response_model=schemas.FleetStats)
+def read_fleet_stats(
+    start_date: datetime = None,
+    end_date: datetime = None,
+    db: Session = Depends(get_db),
+    current_user: schemas.User = Depends(get_current_user)
+):
+    # Defaults to "today so far" (UTC)
+    if start_date is None:
+        start_date = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    start_date = crud.to_utc_naive(start_date)
+    end_date = crud.to_utc_naive(end_date) if end_date else None
+    return fleet_stats.get_fleet_stats(db, start_date, end_date)
+
+@app.get("/fleet/heatmap", response_model=schemas.Heatmap)
+def read_fleet_heatmap(
+    request: Request,
+    response: Response,
+    precision: int = 5,
+    start_date: datetime = None,
+    end_date: datetime = None,
+    db: Session = Depends(get_db),
+    current_user: schemas.User = Depends(get_current_user)
+):
+    # Position counts and dwell time per geohash cell over whole UTC days;
+    # defaults to the last 30 days
+    if not 1 <= precision <= heatmap.PRECISIONS[-1]:
+        raise HTTPException(status_code=400, detail=f"precision must be between 1 and {heatmap.PRECISIONS[-1]}")
+    end_date = crud.to_utc_naive(end_date) if end_date else datetime.utcnow()
+    start_date = crud.to_utc_naive(start_date) if start_date else end_date - timedelta(days=30)
+    if start_date >= end_date:
+        raise HTTPException(status_code=400, detail="start_date must be before end_date")
+    etag = make_etag("heatmap", *crud.get_fleet_version(db), precision, start_date, end_date)
+    cached = not_modified(request, response, etag)
+    if cached:
+        return cached
+    result = heatmap.get_heatmap(db, precision, start_date, end_date)
+    return serialize.json_response(serialize.dumps(result), response)
+
+@app.get("/fleet/near", response_model=schemas.Nearby)
+def read_fleet_near(
+    lat: float,
+    lon: float,
+    request: Request,
+    response: Response,
+    radius_km: float = 5.0,
+    start_date: datetime = None,
+    end_date: datetime = None,
+    db: Session = Depends(get_db),
+    current_user: schemas.User = Depends(get_current_user)
+):
+    # Ships with a fix within radius_km of (lat, lon) in the window, closest
+    # first; defaults to the last 7 days
+    if not geo.valid(lat, lon):
+        raise HTTPException(status_code=400, detail="Invalid coordinates")
+    if not 0 < radius_km <= spatial.MAX_RADIUS_KM:
+        raise HTTPException(status_code=400, detail=f"radius_km must be between 0 and {spatial.MAX_RADIUS_KM}")
+    end_date = crud.to_utc_naive(end_date) if end_date else datetime.utcnow()
+    start_date = crud.to_utc_naive(start_date) if start_date else end_date - timedelta(days=7)
+    if start_date >= end_date:
+        raise HTTPException(status_code=400, detail="start_date must be before end_date")
+    etag = make_etag("near", *crud.get_fleet_version(db), lat, lon, radius_km, start_date, end_date)
+    cached = not_modified(request, response, etag)
+    if cached:
+        return cached
+    result = spatial.get_nearby(db, lat, lon, radius_km, start_date, end_date)
+    return serialize.json_response(serialize.dumps(result), response)
+
+@app.get("/alerts", response_model=List[schemas.Alert])
+def read_alerts(
+    mmsi: str = None,
+    kind: str = None,
+    since: datetime = None,
+    limit: int = 100,
+    db: Session = Depends(get_db),
+    current_user: schemas.User = Depends(get_current_user)
+):
+    ship_id = None
+    if mmsi:
+        ship = crud.get_ship(db, mmsi=mmsi)
+        if not ship:
+            raise HTTPException(status_code=404, detail="Ship not found")
+        ship_id = ship.id
+    return anomaly.get_alerts(db, ship_id=ship_id, kind=kind, since=crud.to_utc_naive(since) if since else None, limit=limit)
+
+@app.get("/reports/fleet")
+def read_fleet_report(
+    start_date: datetime = None,
+    end_date: datetime = None,
+    format: str = "json",
+    workers: int = None,
+    db: Session = Depends(get_db),
+    current_user: schemas.User = Depends(get_current_user)
+):
+    # Per-ship operating report (defaults to the last 30 days), computed on a
+    # process pool; only the CLI (reports.py) writes artifact files
+    if format not in ("json", "csv"):
+        raise HTTPException(status_code=400, detail="format must be json or csv")
+    max_workers = os.cpu_count() or 1
+    if workers is not None and not 1 <= workers <= max_workers:
+        raise HTTPException(status_code=400, detail=f"workers must be between 1 and {max_workers}")
+    end_date = crud.to_utc_naive(end_date) if end_date else datetime.utcnow()
+    start_date = crud.to_utc_naive(start_date) if start_date else end_date - timedelta(days=30)
+    if start_date >= end_date:
+        raise HTTPException(status_code=400, detail="start_date must be before end_date")
+    report = reports.fleet_report(db, start_date, end_date, workers)
+    if format == "csv":
+        filename = f"fleet_{start_date:%Y%m%d}_{end_date:%Y%m%d}.csv"
+        return Response(content=reports.to_csv(report), media_type="text/csv",
+                        headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+    return Response(content=reports.to_json(report), media_type="application/json")
@@ -0,0 +1,35 @@
+from sqlalchemy import inspect
+from sqlalchemy.engine import Engine
+import models
+
+# Databases from builds before (ship_id, timestamp) was unique may hold
+# duplicate samples; keep the first copy of each before the unique index is built.
+_DEDUPE_TELEMETRY = """
+    DELETE FROM telemetry WHERE id NOT IN (
+        SELECT MIN(id) FROM telemetry GROUP BY ship_id, timestamp
+    )
+"""
+
+def _make_telemetry_unique(engine: Engine):
+    indexes = {index["name"] for index in inspect(engine).get_indexes("telemetry")}
+    if "ux_telemetry_ship_id_timestamp" in indexes:
+        return
+    with engine.begin() as connection:
+        removed = connection.exec_driver_sql(_DEDUPE_TELEMETRY).rowcount
+        connection.exec_driver_sql("DROP INDEX IF EXISTS ix_telemetry_ship_id_timestamp")
+    if removed:
+        print(f"Removed {removed} duplicate telemetry samples")
+
+def run(engine: Engine):
+    # create_all only creates missing tables; indexes added to existing tables
+    # (e.g. telemetry) have to be created explicitly on databases from older builds.
+    models.Base.metadata.create_all(bind=engine)
+    _make_telemetry_unique(engine)
+    for table in models.Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+if __name__ == "__main__":
+    from database import engine
+    run(engine)
+    print("Schema is up to date")
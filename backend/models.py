@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Float, DateTime
+from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Float, DateTime, Index, LargeBinary
 from sqlalchemy.orm import relationship
 from database import Base
 import datetime
@@ -28,8 +28,11 @@ class UserShip(Base):
 
 class Telemetry(Base):
     __tablename__ = "telemetry"
+    # One sample per ship and timestamp, so retried uploads are ignored (see ingest.py).
+    # ship_id alone also serves min/max(id) per ship (rowid is the implicit trailing key)
+    __table_args__ = (Index("ux_telemetry_ship_id_timestamp", "ship_id", "timestamp", unique=True),)
     id = Column(Integer, primary_key=True, index=True)
-    ship_id = Column(Integer, ForeignKey("ships.id"))
+    ship_id = Column(Integer, ForeignKey("ships.id"), index=True)
     timestamp = Column(DateTime, default=datetime.datetime.utcnow)
     rpm = Column(Float)
     speed = Column(Float)
@@ -38,3 +41,68 @@ class Telemetry(Base):
     longitude = Column(Float)
     heading = Column(Float, default=0.0)
     ship = relationship("Ship", back_populates="telemetry")
+
+class TelemetryRollup(Base):
+    # Hourly (resolution=3600) and daily (86400) aggregates that outlive raw telemetry
+    __tablename__ = "telemetry_rollups"
+    ship_id = Column(Integer, ForeignKey("ships.id"), primary_key=True)
+    resolution = Column(Integer, primary_key=True)
+    bucket = Column(DateTime, primary_key=True)
+    samples = Column(Integer, default=0)
+    rpm_sum = Column(Float, default=0.0)
+    rpm_max = Column(Float)
+    speed_sum = Column(Float, default=0.0)
+    speed_max = Column(Float)
+    fuel_sum = Column(Float, default=0.0)
+    fuel_max = Column(Float)
+    first_timestamp = Column(DateTime)
+    last_timestamp = Column(DateTime)
+
+class RetentionPolicy(Base):
+    __tablename__ = "retention_policies"
+    ship_id = Column(Integer, ForeignKey("ships.id"), primary_key=True)
+    raw_days = Column(Integer)
+
+class TelemetryChunk(Base):
+    # Archived telemetry for one ship-day, stored column-wise and compressed (see archive.py)
+    __tablename__ = "telemetry_chunks"
+    ship_id = Column(Integer, ForeignKey("ships.id"), primary_key=True)
+    day = Column(DateTime, primary_key=True)
+    samples = Column(Integer)
+    first_timestamp = Column(DateTime)
+    last_timestamp = Column(DateTime)
+    data = Column(LargeBinary)
+
+class Alert(Base):
+    # Samples flagged by the inline anomaly detector (see anomaly.py)
+    __tablename__ = "alerts"
+    __table_args__ = (Index("ix_alerts_ship_id_timestamp", "ship_id", "timestamp"),)
+    id = Column(Integer, primary_key=True, index=True)
+    ship_id = Column(Integer, ForeignKey("ships.id"))
+    timestamp = Column(DateTime, index=True)
+    kind = Column(String, index=True)
+    metric = Column(String)
+    value = Column(Float)
+    expected = Column(Float)
+    zscore = Column(Float)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+class HeatmapBin(Base):
+    # Fleet position counts and dwell time per geohash cell and UTC day, kept
+    # for several precisions (see heatmap.py)
+    __tablename__ = "heatmap_bins"
+    precision = Column(Integer, primary_key=True)
+    day = Column(DateTime, primary_key=True)
+    geohash = Column(String, primary_key=True)
+    samples = Column(Integer, default=0)
+    dwell_seconds = Column(Float, default=0.0)
+
+class TrackCell(Base):
+    # Which ships had fixes in a geohash cell during an hour (see spatial.py)
+    __tablename__ = "track_cells"
+    geohash = Column(String, primary_key=True)
+    hour = Column(DateTime, primary_key=True)
+    ship_id = Column(Integer, ForeignKey("ships.id"), primary_key=True)
+    samples = Column(Integer, default=0)
+    first_timestamp = Column(DateTime)
+    last_timestamp = Column(DateTime)
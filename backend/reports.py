@@ -0,0 +1,257 @@
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+import argparse
+import csv
+import io
+import json
+import multiprocessing
+import os
+import time
+import archive, geo, lazy, migrations, models
+from database import SessionLocal, engine, TIMESTAMP_FORMAT
+
+np = lazy.load("numpy")
+
+# Per-ship operating report for a period: distance, fuel burned, engine hours,
+# port calls and efficiency. Ships are spread over a process pool; each worker
+# opens its own connection and streams its ship's telemetry (archived chunks
+# and raw rows, in time order) in blocks of CHUNK_ROWS, aggregating each block
+# with NumPy while carrying the last sample over to the next block.
+#
+#   python reports.py --start 2026-09-01 --end 2026-10-01 --workers 4
+#
+# Only raw and archived samples are used; hours that retention has reduced to
+# rollups have no positions left to measure distance from.
+
+CHUNK_ROWS = 50000
+MAX_GAP = timedelta(minutes=30)  # longer gaps are outages, not time under way
+ENGINE_ON_RPM = 100.0
+STOPPED_KNOTS = 1.0
+PORT_CALL_MIN = timedelta(hours=1)
+KM_PER_NM = 1.852
+REPORTS_DIR_ENV = "SHIP_REPORTS_DIR"
+
+FIELDS = (
+    "ship_id", "mmsi", "name", "samples", "first_timestamp", "last_timestamp", "distance_nm", "fuel_liters",
+    "engine_hours", "hours_under_way", "port_calls", "avg_speed_under_way", "max_speed",
+    "liters_per_nm", "liters_per_engine_hour",
+)
+
+_RAW = (
+    "SELECT timestamp, rpm, speed, fuel_consumption, latitude, longitude FROM telemetry "
+    "WHERE ship_id = ? AND timestamp >= ? AND timestamp < ? ORDER BY timestamp"
+)
+
+def reports_dir():
+    return os.environ.get(REPORTS_DIR_ENV, "reports")
+
+class _Accumulator:
+    # Running totals for one ship; feed() takes consecutive blocks, oldest first
+    def __init__(self):
+        self.samples = 0
+        self.first = self.last = None
+        self.distance_km = self.fuel = self.engine_hours = self.moving_hours = 0.0
+        self.moving_speed_sum = 0.0
+        self.moving_samples = 0
+        self.max_speed = None
+        self.port_calls = 0
+        self.stop_start = None
+        self.carry = None  # last sample of the previous block
+
+    def feed(self, micros, rpm, speed, fuel, lat, lon):
+        if not len(micros):
+            return
+        self.samples += len(micros)
+        if self.first is None:
+            self.first = micros[0]
+        self.last = micros[-1]
+        block_max = np.nanmax(speed) if not np.all(np.isnan(speed)) else None
+        if block_max is not None:
+            self.max_speed = block_max if self.max_speed is None else max(self.max_speed, block_max)
+        moving = speed >= STOPPED_KNOTS
+        self.moving_speed_sum += float(speed[moving].sum())
+        self.moving_samples += int(moving.sum())
+
+        if self.carry is not None:
+            micros, rpm, speed, fuel, lat, lon = (
+                np.concatenate(([c], a)) for c, a in zip(self.carry, (micros, rpm, speed, fuel, lat, lon))
+            )
+        self.carry = tuple(a[-1] for a in (micros, rpm, speed, fuel, lat, lon))
+
+        # Each interval is attributed to the state of the sample that starts it
+        hours = np.diff(micros) / 3.6e9
+        valid = (hours > 0) & (hours <= MAX_GAP.total_seconds() / 3600)
+        self.fuel += float(np.nansum(fuel[:-1][valid] * hours[valid]))
+        self.engine_hours += float(hours[valid & (rpm[:-1] > ENGINE_ON_RPM)].sum())
+        self.moving_hours += float(hours[valid & (speed[:-1] >= STOPPED_KNOTS)].sum())
+        self.distance_km += float(np.nansum(_haversine_km(lat[:-1], lon[:-1], lat[1:], lon[1:])[valid]))
+        self._count_port_calls(micros, speed >= STOPPED_KNOTS)
+
+    def _count_port_calls(self, micros, moving):
+        # A port call is a stop (speed below STOPPED_KNOTS) lasting at least PORT_CALL_MIN.
+        # Only the transitions are visited, so this stays cheap on long blocks.
+        minimum = PORT_CALL_MIN / timedelta(microseconds=1)
+        changes = np.flatnonzero(np.diff(moving.astype(np.int8))) + 1
+        starts = np.concatenate(([0], changes))
+        for i in starts:
+            if moving[i]:
+                if self.stop_start is not None and micros[i] - self.stop_start >= minimum:
+                    self.port_calls += 1
+                self.stop_start = None
+            elif self.stop_start is None:
+                self.stop_start = micros[i]
+
+    def finish(self):
+        if self.stop_start is not None and self.last - self.stop_start >= PORT_CALL_MIN / timedelta(microseconds=1):
+            self.port_calls += 1  # still alongside at the end of the period
+        distance_nm = self.distance_km / KM_PER_NM
+        to_datetime = lambda us: (datetime(1970, 1, 1) + timedelta(microseconds=int(us))) if us is not None else None
+        return {
+            "samples": self.samples,
+            "first_timestamp": to_datetime(self.first),
+            "last_timestamp": to_datetime(self.last),
+            "distance_nm": round(distance_nm, 3),
+            "fuel_liters": round(self.fuel, 3),
+            "engine_hours": round(self.engine_hours, 3),
+            "hours_under_way": round(self.moving_hours, 3),
+            "port_calls": self.port_calls,
+            "avg_speed_under_way": round(self.moving_speed_sum / self.moving_samples, 3) if self.moving_samples else None,
+            "max_speed": float(self.max_speed) if self.max_speed is not None else None,
+            "liters_per_nm": round(self.fuel / distance_nm, 3) if distance_nm > 0 else None,
+            "liters_per_engine_hour": round(self.fuel / self.engine_hours, 3) if self.engine_hours > 0 else None,
+        }
+
+def _haversine_km(lat1, lon1, lat2, lon2):
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    a = np.sin((phi2 - phi1) / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(np.radians(lon2 - lon1) / 2) ** 2
+    return 2 * geo.EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+def _block(rows):
+    columns = list(zip(*rows))
+    micros = np.array(columns[0], dtype="datetime64[us]").astype(np.int64)
+    return (micros, *(np.array(values, dtype=np.float64) for values in columns[1:]))
+
+def _raw_blocks(connection, ship_id, start, end):
+    if start >= end:
+        return
+    cursor = connection.exec_driver_sql(
+        _RAW, (ship_id, start.strftime(TIMESTAMP_FORMAT), end.strftime(TIMESTAMP_FORMAT))
+    )
+    while True:
+        rows = cursor.fetchmany(CHUNK_ROWS)
+        if not rows:
+            return
+        yield _block(rows)
+
+def _archived_day(db, connection, ship_id, day, start, end):
+    # An archived day plus any late raw samples for it that arrive after archiving
+    rows = [
+        (r.timestamp, r.rpm, r.speed, r.fuel_consumption, r.latitude, r.longitude)
+        for r in archive.load_chunk(db, ship_id, day, start, end - timedelta(microseconds=1))
+    ]
+    for block in _raw_blocks(connection, ship_id, max(start, day), min(end, day + timedelta(days=1))):
+        micros = block[0].astype("datetime64[us]").tolist()
+        rows.extend(zip(micros, *(b.tolist() for b in block[1:])))
+    rows.sort(key=lambda r: r[0])
+    return _block(rows) if rows else None
+
+def _blocks(db, ship_id, start, end):
+    # Time-ordered blocks covering [start, end): raw stretches between archived days
+    connection = db.connection()
+    cursor = start
+    for day, _ in sorted(archive.chunks_in_range(db, ship_id, start, end)):
+        yield from _raw_blocks(connection, ship_id, cursor, max(cursor, day))
+        block = _archived_day(db, connection, ship_id, day, start, end)
+        if block is not None:
+            yield block
+        cursor = max(cursor, day + timedelta(days=1))
+    yield from _raw_blocks(connection, ship_id, cursor, end)
+
+def ship_report(ship_id: int, start: datetime, end: datetime):
+    # Runs in a pool worker with its own session
+    db = SessionLocal()
+    try:
+        totals = _Accumulator()
+        for block in _blocks(db, ship_id, start, end):
+            totals.feed(*block)
+        return totals.finish()
+    finally:
+        db.close()
+
+def _ship_task(task):
+    ship_id, start, end = task
+    return ship_report(ship_id, start, end)
+
+def fleet_report(db, start: datetime, end: datetime, workers: int = None):
+    ships = db.query(models.Ship.id, models.Ship.mmsi, models.Ship.name).order_by(models.Ship.id).all()
+    tasks = [(ship.id, start, end) for ship in ships]
+    started = time.monotonic()
+    workers = max(1, workers or os.cpu_count() or 1)
+    if workers == 1 or len(tasks) <= 1:
+        results = list(map(_ship_task, tasks))
+    else:
+        # spawn: the API process is multi-threaded, which fork does not mix well with
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), mp_context=context) as pool:
+            results = list(pool.map(_ship_task, tasks))
+    rows = [{"ship_id": ship.id, "mmsi": ship.mmsi, "name": ship.name, **result} for ship, result in zip(ships, results)]
+    fuel = sum(r["fuel_liters"] for r in rows)
+    distance = sum(r["distance_nm"] for r in rows)
+    return {
+        "start": start,
+        "end": end,
+        "generated_at": datetime.utcnow(),
+        "workers": workers,
+        "seconds": round(time.monotonic() - started, 3),
+        "ships": rows,
+        "totals": {
+            "samples": sum(r["samples"] for r in rows),
+            "distance_nm": round(distance, 3),
+            "fuel_liters": round(fuel, 3),
+            "engine_hours": round(sum(r["engine_hours"] for r in rows), 3),
+            "port_calls": sum(r["port_calls"] for r in rows),
+            "liters_per_nm": round(fuel / distance, 3) if distance > 0 else None,
+        },
+    }
+
+def to_csv(report):
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=FIELDS)
+    writer.writeheader()
+    for row in report["ships"]:
+        writer.writerow({key: (value.isoformat() if isinstance(value, datetime) else value) for key, value in row.items()})
+    return out.getvalue()
+
+def to_json(report):
+    return json.dumps(report, default=lambda value: value.isoformat(), indent=2)
+
+def write_artifacts(report, directory: str = None):
+    directory = directory or reports_dir()
+    os.makedirs(directory, exist_ok=True)
+    stem = os.path.join(directory, f"fleet_{report['start']:%Y%m%d}_{report['end']:%Y%m%d}")
+    with open(stem + ".csv", "w", newline="") as f:
+        f.write(to_csv(report))
+    with open(stem + ".json", "w") as f:
+        f.write(to_json(report))
+    return [stem + ".csv", stem + ".json"]
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-ship operating report for the whole fleet")
+    parser.add_argument("--start", type=datetime.fromisoformat, required=True, help="UTC, e.g. 2026-09-01")
+    parser.add_argument("--end", type=datetime.fromisoformat, required=True, help="UTC, exclusive")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes (1 = serial)")
+    parser.add_argument("--out", default=reports_dir(), help="directory for the CSV/JSON artifacts")
+    args = parser.parse_args()
+
+    migrations.run(engine)
+    db = SessionLocal()
+    try:
+        report = fleet_report(db, args.start, args.end, args.workers)
+    finally:
+        db.close()
+    for path in write_artifacts(report, args.out):
+        print(path)
+    print(f"{len(report['ships'])} ships in {report['seconds']} s with {report['workers']} workers")
+
+if __name__ == "__main__":
+    main()
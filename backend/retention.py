@@ -0,0 +1,196 @@
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+import argparse
+import time
+import crud, migrations, models, rollups
+from database import SessionLocal, engine
+
+# Ages raw telemetry out after N days (global default or per-ship policy).
+# Expired rows are folded into the hourly rollup and deleted a few ship-hours
+# at a time, each batch in its own short transaction, so the write lock is only
+# held briefly and ingestion keeps flowing while the job runs on a live database.
+
+DEFAULT_RAW_DAYS = 90
+DEFAULT_BATCH_ROWS = 5000
+DEFAULT_PAUSE = 0.02
+VACUUM_STEP_PAGES = 2000
+
+def get_policies(db: Session, default_days: int):
+    policies = {p.ship_id: p.raw_days for p in db.query(models.RetentionPolicy).all()}
+    return {ship: policies.get(ship.id, default_days) for ship in db.query(models.Ship).order_by(models.Ship.id)}
+
+def set_policy(db: Session, ship_id: int, raw_days):
+    # raw_days=None keeps the ship's raw telemetry forever
+    db.merge(models.RetentionPolicy(ship_id=ship_id, raw_days=raw_days))
+    db.commit()
+
+def clear_policy(db: Session, ship_id: int):
+    db.query(models.RetentionPolicy).filter(models.RetentionPolicy.ship_id == ship_id).delete()
+    db.commit()
+
+def cutoff_for(raw_days: int, now: datetime = None):
+    # Aligned to the hour so only complete hours are ever rolled up
+    return rollups.floor_hour((now or datetime.utcnow()) - timedelta(days=raw_days))
+
+def _expired(db: Session, ship_id: int, cutoff: datetime):
+    return db.query(models.Telemetry).filter(
+        models.Telemetry.ship_id == ship_id, models.Telemetry.timestamp < cutoff
+    )
+
+def _expired_chunks(db: Session, ship_id: int, cutoff: datetime):
+    # Only whole archived days that end before the cutoff
+    return db.query(models.TelemetryChunk).filter(
+        models.TelemetryChunk.ship_id == ship_id, models.TelemetryChunk.day <= cutoff - timedelta(days=1)
+    )
+
+def _bytes_per_row(db: Session):
+    page_size = db.execute(text("PRAGMA page_size")).scalar()
+    pages = db.execute(text("PRAGMA page_count")).scalar() - db.execute(text("PRAGMA freelist_count")).scalar()
+    rows = db.query(func.max(models.Telemetry.id)).scalar() or 0
+    return page_size * pages / rows if rows else 0
+
+def plan(db: Session, default_days: int = DEFAULT_RAW_DAYS, now: datetime = None):
+    report = []
+    for ship, raw_days in get_policies(db, default_days).items():
+        if raw_days is None:
+            continue
+        cutoff = cutoff_for(raw_days, now)
+        expired = _expired(db, ship.id, cutoff)
+        rows = expired.count()
+        oldest = expired.with_entities(func.min(models.Telemetry.timestamp)).scalar()
+        chunks = _expired_chunks(db, ship.id, cutoff).count()
+        report.append({"ship_id": ship.id, "mmsi": ship.mmsi, "raw_days": raw_days,
+                       "cutoff": cutoff, "rows": rows, "chunks": chunks, "oldest": oldest})
+    return report
+
+def _age_out_hour(db: Session, ship_id: int, hour: datetime):
+    rollups.merge_hour(db, ship_id, hour)
+    deleted = db.query(models.Telemetry).filter(
+        models.Telemetry.ship_id == ship_id,
+        models.Telemetry.timestamp >= hour,
+        models.Telemetry.timestamp < hour + timedelta(hours=1),
+    ).delete(synchronize_session=False)
+    rollups.rebuild_day(db, ship_id, rollups.floor_day(hour))
+    return deleted
+
+def run(db: Session, default_days: int = DEFAULT_RAW_DAYS, pause: float = DEFAULT_PAUSE,
+        batch_rows: int = DEFAULT_BATCH_ROWS, now: datetime = None, log=print):
+    stats = {"ships": 0, "hours": 0, "batches": 0, "rows_deleted": 0, "days_rebuilt": 0, "chunks_deleted": 0}
+    started = time.monotonic()
+    for item in plan(db, default_days, now):
+        if not item["rows"] and not item["chunks"]:
+            continue
+        stats["ships"] += 1
+        ship_id, cutoff = item["ship_id"], item["cutoff"]
+        if item["chunks"]:
+            # Archived days were rolled up when they were archived
+            stats["chunks_deleted"] += _expired_chunks(db, ship_id, cutoff).delete(synchronize_session=False)
+            db.commit()
+        days = set()
+        deleted = 0
+        done = False
+        while not done:
+            in_batch = 0
+            while in_batch < batch_rows:
+                oldest = _expired(db, ship_id, cutoff).with_entities(func.min(models.Telemetry.timestamp)).scalar()
+                if oldest is None:
+                    done = True
+                    break
+                hour = rollups.floor_hour(oldest)
+                in_batch += _age_out_hour(db, ship_id, hour)
+                days.add(rollups.floor_day(hour))
+                stats["hours"] += 1
+            db.commit()
+            deleted += in_batch
+            stats["batches"] += 1
+            if stats["batches"] % 20 == 0:
+                rate = (stats["rows_deleted"] + deleted) / (time.monotonic() - started)
+                log(f"  {item['mmsi']}: {deleted}/{item['rows']} rows aged out ({rate:.0f} rows/s)")
+            if pause and not done:
+                time.sleep(pause)
+        stats["rows_deleted"] += deleted
+        stats["days_rebuilt"] += len(days)
+        log(f"{item['mmsi']}: deleted {deleted} rows older than {item['cutoff']:%Y-%m-%d %H:%M}")
+    stats["seconds"] = round(time.monotonic() - started, 2)
+    return stats
+
+def reclaim_space(db: Session, log=print):
+    # Incremental vacuum returns free pages in small steps without an exclusive
+    # rebuild; it requires auto_vacuum=INCREMENTAL (see --enable-incremental-vacuum).
+    mode = db.execute(text("PRAGMA auto_vacuum")).scalar()
+    if mode != 2:
+        log("auto_vacuum is not INCREMENTAL; freed pages stay in the file for reuse. "
+            "Run once with --enable-incremental-vacuum during a maintenance window to reclaim space.")
+        return 0
+    freed = 0
+    while True:
+        free = db.execute(text("PRAGMA freelist_count")).scalar()
+        if not free:
+            break
+        # Each step of the pragma frees one page, so drain it through the raw cursor
+        cursor = db.connection().connection.cursor()
+        cursor.execute(f"PRAGMA incremental_vacuum({min(free, VACUUM_STEP_PAGES)})").fetchall()
+        db.commit()
+        remaining = db.execute(text("PRAGMA freelist_count")).scalar()
+        if remaining >= free:
+            break
+        freed += free - remaining
+    log(f"Reclaimed {freed} pages")
+    return freed
+
+def enable_incremental_vacuum(db: Session):
+    # auto_vacuum can only change through a full VACUUM, which rewrites the file
+    db.commit()
+    with db.get_bind().connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+        connection.exec_driver_sql("VACUUM")
+
+def print_plan(db: Session, default_days: int):
+    bytes_per_row = _bytes_per_row(db)
+    total = 0
+    for item in plan(db, default_days):
+        total += item["rows"]
+        oldest = item["oldest"].strftime("%Y-%m-%d") if item["oldest"] else "-"
+        print(f"{item['mmsi']:>12}  keep {item['raw_days']:>4} days  cutoff {item['cutoff']:%Y-%m-%d %H:%M}"
+              f"  oldest {oldest}  rows to age out {item['rows']}  archived days {item['chunks']}")
+    print(f"Total: {total} rows, ~{total * bytes_per_row / 1e6:.1f} MB")
+
+def main():
+    parser = argparse.ArgumentParser(description="Age out raw telemetry, keeping hourly and daily rollups")
+    parser.add_argument("--days", type=int, default=DEFAULT_RAW_DAYS, help="default raw retention in days")
+    parser.add_argument("--dry-run", action="store_true", help="report what would be deleted and exit")
+    parser.add_argument("--pause", type=float, default=DEFAULT_PAUSE, help="seconds to sleep between batches")
+    parser.add_argument("--batch-rows", type=int, default=DEFAULT_BATCH_ROWS, help="rows deleted per transaction")
+    parser.add_argument("--set-policy", nargs=2, metavar=("MMSI", "DAYS"), help="per-ship retention ('none' keeps forever, 'default' clears)")
+    parser.add_argument("--enable-incremental-vacuum", action="store_true", help="switch the database to auto_vacuum=INCREMENTAL (full VACUUM)")
+    args = parser.parse_args()
+
+    migrations.run(engine)
+    db = SessionLocal()
+    try:
+        if args.set_policy:
+            mmsi, days = args.set_policy
+            ship = crud.get_ship(db, mmsi=mmsi)
+            if not ship:
+                parser.error(f"Unknown ship {mmsi}")
+            if days == "default":
+                clear_policy(db, ship.id)
+            else:
+                set_policy(db, ship.id, None if days == "none" else int(days))
+            return
+        if args.enable_incremental_vacuum:
+            enable_incremental_vacuum(db)
+            print("auto_vacuum set to INCREMENTAL")
+            return
+        print_plan(db, args.days)
+        if args.dry_run:
+            return
+        stats = run(db, args.days, args.pause, args.batch_rows)
+        reclaim_space(db)
+        print(stats)
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
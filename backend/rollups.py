@@ -0,0 +1,99 @@
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+from database import TIMESTAMP_FORMAT, parse_timestamp
+
+HOUR = 3600
+DAY = 86400
+
+# Folds the raw rows of one ship-hour into the hourly rollup. Counts and sums
+# are added to any existing bucket, so callers must delete the rows they rolled
+# up in the same transaction (late samples for an already-aged hour then merge
+# in correctly instead of replacing the bucket).
+_MERGE_HOUR = text("""
+    INSERT INTO telemetry_rollups (
+        ship_id, resolution, bucket, samples, rpm_sum, rpm_max, speed_sum, speed_max,
+        fuel_sum, fuel_max, first_timestamp, last_timestamp
+    )
+    SELECT ship_id, :resolution, :bucket, COUNT(*), SUM(rpm), MAX(rpm), SUM(speed), MAX(speed),
+           SUM(fuel_consumption), MAX(fuel_consumption), MIN(timestamp), MAX(timestamp)
+    FROM telemetry
+    WHERE ship_id = :ship_id AND timestamp >= :start AND timestamp < :end
+    GROUP BY ship_id
+    ON CONFLICT (ship_id, resolution, bucket) DO UPDATE SET
+        samples = samples + excluded.samples,
+        rpm_sum = rpm_sum + excluded.rpm_sum,
+        rpm_max = MAX(rpm_max, excluded.rpm_max),
+        speed_sum = speed_sum + excluded.speed_sum,
+        speed_max = MAX(speed_max, excluded.speed_max),
+        fuel_sum = fuel_sum + excluded.fuel_sum,
+        fuel_max = MAX(fuel_max, excluded.fuel_max),
+        first_timestamp = MIN(first_timestamp, excluded.first_timestamp),
+        last_timestamp = MAX(last_timestamp, excluded.last_timestamp)
+""")
+
+# Daily buckets are always rebuilt from their hourly buckets, which makes them idempotent
+_REBUILD_DAY = text("""
+    INSERT OR REPLACE INTO telemetry_rollups (
+        ship_id, resolution, bucket, samples, rpm_sum, rpm_max, speed_sum, speed_max,
+        fuel_sum, fuel_max, first_timestamp, last_timestamp
+    )
+    SELECT ship_id, :day_resolution, :bucket, SUM(samples), SUM(rpm_sum), MAX(rpm_max), SUM(speed_sum),
+           MAX(speed_max), SUM(fuel_sum), MAX(fuel_max), MIN(first_timestamp), MAX(last_timestamp)
+    FROM telemetry_rollups
+    WHERE ship_id = :ship_id AND resolution = :hour_resolution AND bucket >= :start AND bucket < :end
+    GROUP BY ship_id
+""")
+
+# Ship-days holding samples that only survive in the rollups (aged out by
+# retention): the daily bucket counts more samples than the day's archived
+# chunk, if any. Raw rows are never rolled up, so they don't enter the check.
+_AGED_DAYS = text("""
+    SELECT r.ship_id, r.bucket FROM telemetry_rollups r
+    LEFT JOIN telemetry_chunks c ON c.ship_id = r.ship_id AND c.day = r.bucket
+    WHERE r.resolution = :resolution AND r.bucket >= :start AND r.bucket < :end
+      AND r.samples > COALESCE(c.samples, 0)
+""")
+
+def floor_hour(value: datetime):
+    return value.replace(minute=0, second=0, microsecond=0)
+
+def floor_day(value: datetime):
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def aged_days(db: Session, start: datetime, end: datetime):
+    # {(ship_id, day)} in [start, end) that can no longer be recomputed from stored samples
+    params = {"resolution": DAY, "start": start.strftime(TIMESTAMP_FORMAT), "end": end.strftime(TIMESTAMP_FORMAT)}
+    return {(ship_id, parse_timestamp(day)) for ship_id, day in db.execute(_AGED_DAYS, params)}
+
+def day_ranges(start: datetime, end: datetime, skip):
+    # [start, end) split into runs of whole days, leaving out the days in skip
+    ranges = []
+    day = start
+    while day < end:
+        if day not in skip:
+            if ranges and ranges[-1][1] == day:
+                ranges[-1][1] = day + timedelta(days=1)
+            else:
+                ranges.append([day, day + timedelta(days=1)])
+        day += timedelta(days=1)
+    return [tuple(r) for r in ranges]
+
+def merge_hour(db: Session, ship_id: int, hour: datetime):
+    db.execute(_MERGE_HOUR, {
+        "ship_id": ship_id,
+        "resolution": HOUR,
+        "bucket": hour.strftime(TIMESTAMP_FORMAT),
+        "start": hour.strftime(TIMESTAMP_FORMAT),
+        "end": (hour + timedelta(hours=1)).strftime(TIMESTAMP_FORMAT),
+    })
+
+def rebuild_day(db: Session, ship_id: int, day: datetime):
+    db.execute(_REBUILD_DAY, {
+        "ship_id": ship_id,
+        "day_resolution": DAY,
+        "hour_resolution": HOUR,
+        "bucket": day.strftime(TIMESTAMP_FORMAT),
+        "start": day.strftime(TIMESTAMP_FORMAT),
+        "end": (day + timedelta(days=1)).strftime(TIMESTAMP_FORMAT),
+    })
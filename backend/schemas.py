@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 
 class TelemetryBase(BaseModel):
@@ -11,7 +11,11 @@ class TelemetryBase(BaseModel):
     heading: Optional[float] = 0.0
 
 class TelemetryCreate(TelemetryBase):
-    pass
+    # Device time of the sample; server time when omitted
+    timestamp: Optional[datetime] = None
+
+class TelemetryBatchItem(TelemetryCreate):
+    mmsi: str
 
 class Telemetry(TelemetryBase):
     id: int
@@ -50,3 +54,113 @@ class User(UserBase):
     
     class Config:
         from_attributes = True
+
+class ShipStats(BaseModel):
+    ship_id: int
+    mmsi: str
+    name: str
+    samples: int
+    avg_speed: Optional[float] = None
+    avg_fuel_consumption: Optional[float] = None
+    fuel_burned: float
+    first_timestamp: Optional[datetime] = None
+    last_timestamp: Optional[datetime] = None
+    last_speed: Optional[float] = None
+    status: str
+
+class FleetStats(BaseModel):
+    start: datetime
+    end: Optional[datetime] = None
+    ships: List[ShipStats]
+    total_samples: int
+    total_fuel_burned: float
+    avg_speed: Optional[float] = None
+    active: int
+    idle: int
+    offline: int
+
+class Alert(BaseModel):
+    id: int
+    ship_id: int
+    timestamp: datetime
+    kind: str
+    metric: str
+    value: float
+    expected: float
+    zscore: float
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class ShipSeries(BaseModel):
+    ship_id: int
+    mmsi: str
+    name: str
+    samples: List[int]
+    rpm: List[Optional[float]]
+    speed: List[Optional[float]]
+    fuel_consumption: List[Optional[float]]
+
+class TelemetrySeries(BaseModel):
+    start: datetime
+    end: datetime
+    bucket: int
+    timestamps: List[datetime]
+    series: List[ShipSeries]
+
+class HeatmapCell(BaseModel):
+    geohash: str
+    lat: float
+    lon: float
+    bounds: List[float]
+    samples: int
+    dwell_seconds: float
+
+class Heatmap(BaseModel):
+    precision: int
+    start: datetime
+    end: datetime
+    cells: List[HeatmapCell]
+
+class NearbyShip(BaseModel):
+    ship_id: int
+    mmsi: str
+    name: str
+    fixes: int
+    first_timestamp: datetime
+    last_timestamp: datetime
+    closest_km: float
+    closest_timestamp: datetime
+    latitude: float
+    longitude: float
+
+class UnverifiedShip(BaseModel):
+    ship_id: int
+    mmsi: str
+    name: str
+    first_hour: datetime
+    last_hour: datetime
+
+class Nearby(BaseModel):
+    lat: float
+    lon: float
+    radius_km: float
+    start: datetime
+    end: datetime
+    candidates: int
+    ships: List[NearbyShip]
+    unverified: List[UnverifiedShip]
+
+class Readiness(BaseModel):
+    ready: bool
+    migrations: str
+    live: str
+    phases: Dict[str, float]
+
+class LiveStats(BaseModel):
+    ships: int
+    ring_size: int
+    samples: int
+    bytes_per_ship: int
+    total_bytes: int
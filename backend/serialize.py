@@ -0,0 +1,84 @@
+from fastapi import Response
+from array import array
+from datetime import datetime, timedelta
+import json
+import struct
+import sys
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Bulk response encoding. Large telemetry reads skip per-row Pydantic models:
+# rows stay plain column tuples and go straight to orjson (stdlib json when it
+# isn't installed), producing the same document as response_model=List[Telemetry].
+#
+# Charts and maps can ask for struct-of-arrays instead (format=columnar): one
+# array per field, timestamps as epoch milliseconds. format=binary sends the
+# same columns as raw little-endian float64 arrays that a browser wraps in
+# Float64Array views without parsing:
+#     "SCL1" | u32 count | count x f64 for each of COLUMNS (null -> NaN)
+
+COLUMNS = ("id", "ship_id", "timestamp", "rpm", "speed", "fuel_consumption", "latitude", "longitude", "heading")
+FORMATS = ("rows", "columnar", "binary")
+BINARY = "application/x-ship-columns"
+BINARY_MAGIC = b"SCL1"
+
+_EPOCH = datetime(1970, 1, 1)
+_NAN = float("nan")
+
+def _default(value):
+    return value.isoformat()
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, default=_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+def telemetry_json(rows) -> bytes:
+    # rows: tuples in archive.TelemetryRow order; keys in schemas.Telemetry field order
+    return dumps([
+        {"rpm": r[3], "speed": r[4], "fuel_consumption": r[5], "latitude": r[6], "longitude": r[7],
+         "heading": r[8], "id": r[0], "ship_id": r[1], "timestamp": r[2]}
+        for r in rows
+    ])
+
+def epoch_ms(value: datetime):
+    return (value - _EPOCH) // timedelta(milliseconds=1)
+
+def _columns(rows):
+    columns = list(zip(*rows)) or [()] * len(COLUMNS)
+    return [list(values) for values in columns[:2]] + [[epoch_ms(t) for t in columns[2]]] + [list(values) for values in columns[3:]]
+
+def telemetry_columnar(rows) -> bytes:
+    # rows: tuples in archive.TelemetryRow order
+    document = {"count": len(rows)}
+    document.update(zip(COLUMNS, _columns(rows)))
+    return dumps(document)
+
+def telemetry_binary(rows) -> bytes:
+    parts = [struct.pack("<4sI", BINARY_MAGIC, len(rows))]
+    for values in _columns(rows):
+        column = array("d", [_NAN if v is None else v for v in values])
+        if sys.byteorder == "big":
+            column.byteswap()
+        parts.append(column.tobytes())
+    return b"".join(parts)
+
+def content_response(body: bytes, media_type: str, response: Response = None):
+    # Carries over headers (ETag, Cache-Control) set on the injected response
+    headers = dict(response.headers) if response is not None else None
+    return Response(content=body, media_type=media_type, headers=headers)
+
+def json_response(body: bytes, response: Response = None):
+    return content_response(body, "application/json", response)
+
+def telemetry_body(rows, format: str):
+    # (body, media type), so encoded bodies can be shared between requests
+    if format == "binary":
+        return telemetry_binary(rows), BINARY
+    return (telemetry_columnar(rows) if format == "columnar" else telemetry_json(rows)), "application/json"
+
+def telemetry_response(rows, format: str, response: Response = None):
+    return content_response(*telemetry_body(rows, format), response)
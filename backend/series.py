@@ -0,0 +1,163 @@
+from sqlalchemy import bindparam, text
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+import archive, rollups
+from database import TIMESTAMP_FORMAT
+
+# Multi-ship history on a shared bucket grid: one GROUP BY (ship, bucket) over
+# raw telemetry for all requested ships, plus one over the rollups when the
+# bucket width is a whole number of hours. Raw rows and rolled-up hours never
+# overlap (retention/archive delete what they roll up), so the two are summed.
+# Other widths cannot be built from hourly rollups; archived days are then
+# decoded from their chunks instead (hours already aged out by retention
+# exist only as rollups and stay empty on such grids).
+# Buckets are aligned to the epoch, so the same width always gives the same grid.
+#
+# Senders may apply a deadband and skip samples that did not change (see
+# ship_simulator/deadband.py), so a quiet ship leaves empty buckets. With
+# fill=previous those are read as a step function: each empty bucket repeats
+# the ship's last known values, for up to FILL_HOLD after the last sample
+# (longer silences are outages and stay empty). Filled buckets keep samples=0.
+
+MAX_BUCKETS = 5000
+FILLS = ("none", "previous")
+FILL_HOLD = timedelta(minutes=10)  # senders heartbeat at least every 5 minutes
+METRICS = ("rpm", "speed", "fuel_consumption")
+
+_EPOCH = datetime(1970, 1, 1)
+
+# strftime('%s') rounds fractional seconds, so cut them off first
+_RAW = text("""
+    SELECT ship_id, (CAST(strftime('%s', substr(timestamp, 1, 19)) AS INTEGER) - :origin) / :bucket AS slot,
+           COUNT(*), SUM(rpm), SUM(speed), SUM(fuel_consumption),
+           CAST(strftime('%s', substr(MAX(timestamp), 1, 19)) AS INTEGER)
+    FROM telemetry
+    WHERE ship_id IN :ship_ids AND timestamp >= :start AND timestamp < :end
+    GROUP BY ship_id, slot
+""").bindparams(bindparam("ship_ids", expanding=True))
+
+_ROLLED_UP = text("""
+    SELECT ship_id, (CAST(strftime('%s', substr(bucket, 1, 19)) AS INTEGER) - :origin) / :bucket AS slot,
+           SUM(samples), SUM(rpm_sum), SUM(speed_sum), SUM(fuel_sum),
+           CAST(strftime('%s', substr(MAX(last_timestamp), 1, 19)) AS INTEGER)
+    FROM telemetry_rollups
+    WHERE resolution = :resolution AND ship_id IN :ship_ids AND bucket >= :start AND bucket < :end
+    GROUP BY ship_id, slot
+""").bindparams(bindparam("ship_ids", expanding=True))
+
+# Last sample of each bucket (a lone MAX() makes SQLite return the other bare
+# columns from that row) and the last one before the window, for fill=previous
+_LAST = text("""
+    SELECT (CAST(strftime('%s', substr(timestamp, 1, 19)) AS INTEGER) - :origin) / :bucket AS slot,
+           MAX(timestamp), rpm, speed, fuel_consumption
+    FROM telemetry WHERE ship_id = :ship_id AND timestamp >= :start AND timestamp < :end
+    GROUP BY slot
+""")
+
+_BEFORE = text("""
+    SELECT rpm, speed, fuel_consumption, CAST(strftime('%s', substr(timestamp, 1, 19)) AS INTEGER)
+    FROM telemetry WHERE ship_id = :ship_id AND timestamp < :start AND timestamp >= :since
+    ORDER BY timestamp DESC LIMIT 1
+""")
+
+def _epoch_seconds(value: datetime):
+    return int((value - _EPOCH).total_seconds())
+
+def grid(start: datetime, end: datetime, bucket: int):
+    # (origin, bucket count) covering [start, end)
+    origin = _epoch_seconds(start) // bucket * bucket
+    count = -(-(_epoch_seconds(end) - origin) // bucket)
+    return origin, max(count, 0)
+
+def _fill_previous(db: Session, entry, params, last_seen):
+    # Step-wise reconstruction of empty buckets from the preceding sample.
+    # Buckets known only from rollups or chunks carry their mean instead.
+    hold = FILL_HOLD.total_seconds()
+    params = {**params, "ship_id": entry["ship_id"]}
+    last = {slot: values for slot, _, *values in db.execute(_LAST, params)}
+    since = datetime.strptime(params["start"], TIMESTAMP_FORMAT) - FILL_HOLD
+    before = db.execute(_BEFORE, {**params, "since": since.strftime(TIMESTAMP_FORMAT)}).first()
+    values, seen = (before[:3], before[3]) if before else (None, None)
+    for slot in range(len(entry["samples"])):
+        if entry["samples"][slot]:
+            values = last.get(slot) or tuple(entry[metric][slot] for metric in METRICS)
+            seen = last_seen[slot]
+        elif values is not None and params["origin"] + slot * params["bucket"] - seen <= hold:
+            for metric, value in zip(METRICS, values):
+                entry[metric][slot] = value
+
+def _archived(db: Session, ship_ids, origin: int, bucket: int, start: datetime, end: datetime):
+    # Same (ship_id, slot, samples, sums..., last) tuples as _RAW, from archived chunks
+    result = []
+    last_included = end - timedelta(microseconds=1)  # load_chunk's end is inclusive
+    for ship_id in ship_ids:
+        slots = {}
+        for day, _ in archive.chunks_in_range(db, ship_id, start, last_included):
+            for r in archive.load_chunk(db, ship_id, day, start, last_included):
+                seconds = _epoch_seconds(r.timestamp)
+                current = slots.setdefault((seconds - origin) // bucket, [0, 0.0, 0.0, 0.0, seconds])
+                current[0] += 1
+                current[1] += r.rpm or 0.0
+                current[2] += r.speed or 0.0
+                current[3] += r.fuel_consumption or 0.0
+                current[4] = max(current[4], seconds)
+        result.extend((ship_id, slot, *sums) for slot, sums in slots.items())
+    return result
+
+def get_series(db: Session, ships, start: datetime, end: datetime, bucket: int, fill: str = "none"):
+    origin, count = grid(start, end, bucket)
+    window_start = _EPOCH + timedelta(seconds=origin)
+    window_end = window_start + timedelta(seconds=count * bucket)
+    params = {
+        "ship_ids": [ship.id for ship in ships],
+        "origin": origin,
+        "bucket": bucket,
+        "start": window_start.strftime(TIMESTAMP_FORMAT),
+        "end": window_end.strftime(TIMESTAMP_FORMAT),
+    }
+    sums = {ship.id: {} for ship in ships}
+
+    def fold(result):
+        for ship_id, slot, samples, rpm, speed, fuel, last in result:
+            current = sums[ship_id].get(slot)
+            if current is None:
+                sums[ship_id][slot] = [samples, rpm or 0.0, speed or 0.0, fuel or 0.0, last]
+            else:
+                current[0] += samples
+                current[1] += rpm or 0.0
+                current[2] += speed or 0.0
+                current[3] += fuel or 0.0
+                current[4] = max(current[4], last)
+
+    fold(db.execute(_RAW, params))
+    if bucket % rollups.HOUR == 0:
+        # Daily rollups are enough when the grid is made of whole UTC days
+        resolution = rollups.DAY if bucket % rollups.DAY == 0 else rollups.HOUR
+        fold(db.execute(_ROLLED_UP, {**params, "resolution": resolution}))
+    else:
+        fold(_archived(db, params["ship_ids"], origin, bucket, window_start, window_end))
+
+    series = []
+    for ship in ships:
+        slots = sums[ship.id]
+        entry = {"ship_id": ship.id, "mmsi": ship.mmsi, "name": ship.name, "samples": [0] * count}
+        for metric in METRICS:
+            entry[metric] = [None] * count
+        last_seen = {}
+        for slot, (samples, rpm, speed, fuel, last) in slots.items():
+            if 0 <= slot < count and samples:
+                entry["samples"][slot] = samples
+                entry["rpm"][slot] = rpm / samples
+                entry["speed"][slot] = speed / samples
+                entry["fuel_consumption"][slot] = fuel / samples
+                last_seen[slot] = last
+        if fill == "previous":
+            _fill_previous(db, entry, params, last_seen)
+        series.append(entry)
+    return {
+        "start": window_start,
+        "end": window_end,
+        "bucket": bucket,
+        "timestamps": [window_start + timedelta(seconds=i * bucket) for i in range(count)],
+        "series": series,
+    }
@@ -0,0 +1,242 @@
+from sqlalchemy import bindparam, text
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+import argparse
+import math
+import archive, crud, geo, migrations, models, rollups
+from database import SessionLocal, engine, TIMESTAMP_FORMAT, parse_timestamp
+
+# Spatio-temporal index of ship tracks for "which ships passed near here"
+# queries. Every stored fix marks its ship in the (geohash cell, UTC hour) it
+# falls in, maintained at ingest in the same transaction as the telemetry rows.
+# A query covers its circle with cells, reads the (ship, hour) candidates of
+# those cells from the index, and only loads the fixes of those ships and hours
+# (raw or archived) for the exact haversine test. Hours whose raw fixes retention
+# has already deleted stay in the index and are reported as unverified.
+#
+#   python spatial.py --rebuild --days 90   # (re)build the index from stored history
+
+PRECISION = 5  # cells of about 4.9 x 4.9 km
+MAX_COVER_CELLS = 64
+MAX_RADIUS_KM = 500.0
+KM_PER_DEGREE = math.pi * geo.EARTH_RADIUS_KM / 180
+
+_UPSERT = (
+    "INSERT INTO track_cells (geohash, hour, ship_id, samples, first_timestamp, last_timestamp) "
+    "VALUES (?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT (geohash, hour, ship_id) DO UPDATE SET samples = samples + excluded.samples, "
+    "first_timestamp = min(first_timestamp, excluded.first_timestamp), "
+    "last_timestamp = max(last_timestamp, excluded.last_timestamp)"
+)
+
+# Cells at the stored precision are looked up directly; coarser covers (large
+# radius) scan the primary key by geohash prefix
+_IN_CELLS = text("""
+    SELECT DISTINCT ship_id, hour FROM track_cells
+    WHERE geohash IN :cells AND hour >= :start_hour AND hour < :end
+""").bindparams(bindparam("cells", expanding=True))
+
+_IN_PREFIX = text("""
+    SELECT DISTINCT ship_id, hour FROM track_cells
+    WHERE geohash >= :prefix AND geohash < :prefix || '~' AND hour >= :start_hour AND hour < :end
+""")
+
+_FIXES = text("""
+    SELECT timestamp, latitude, longitude FROM telemetry
+    WHERE ship_id = :ship_id AND timestamp >= :start AND timestamp < :end
+""")
+
+def _accumulate(cells, ship_id, fixes):
+    for timestamp, lat, lon in fixes:
+        if not geo.valid(lat, lon):
+            continue
+        key = (geo.encode(lat, lon, PRECISION), rollups.floor_hour(timestamp), ship_id)
+        entry = cells.get(key)
+        if entry is None:
+            cells[key] = [1, timestamp, timestamp]
+        else:
+            entry[0] += 1
+            entry[1] = min(entry[1], timestamp)
+            entry[2] = max(entry[2], timestamp)
+
+def _write(db: Session, cells):
+    params = [
+        (cell, hour.strftime(TIMESTAMP_FORMAT), ship_id, samples,
+         first.strftime(TIMESTAMP_FORMAT), last.strftime(TIMESTAMP_FORMAT))
+        for (cell, hour, ship_id), (samples, first, last) in cells.items()
+    ]
+    if params:
+        db.connection().exec_driver_sql(_UPSERT, params)
+
+def process_rows(db: Session, rows):
+    # rows in crud.TELEMETRY_COLUMNS order
+    cells = {}
+    for ship_id, timestamp, _, _, _, lat, lon, _ in rows:
+        _accumulate(cells, ship_id, [(timestamp, lat, lon)])
+    _write(db, cells)
+
+def cover(lat: float, lon: float, radius_km: float):
+    # (precision, cells) covering the circle's bounding box: the stored
+    # precision when that takes at most MAX_COVER_CELLS cells, else coarser
+    dlat = radius_km / KM_PER_DEGREE
+    lat_min, lat_max = max(-90.0, lat - dlat), min(90.0, lat + dlat)
+    widest = max(abs(lat_min), abs(lat_max))
+    dlon = 180.0 if widest >= 89.9 else min(180.0, dlat / math.cos(math.radians(widest)))
+    for precision in range(PRECISION, 0, -1):
+        lat_bits = 5 * precision // 2
+        lon_bits = 5 * precision - lat_bits
+        lat_step, lon_step = 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+        rows = range(
+            int((lat_min + 90.0) // lat_step),
+            min(int((lat_max + 90.0) // lat_step), (1 << lat_bits) - 1) + 1,
+        )
+        if dlon >= 180.0:
+            columns = range(1 << lon_bits)
+        else:
+            first = int((lon - dlon + 180.0) // lon_step)
+            columns = range(first, min(int((lon + dlon + 180.0) // lon_step), first + (1 << lon_bits) - 1) + 1)
+        if len(rows) * len(columns) <= MAX_COVER_CELLS or precision == 1:
+            # Columns past +/-180 wrap around to the other side
+            cells = {
+                geo.encode(-90.0 + (i + 0.5) * lat_step, -180.0 + (j % (1 << lon_bits) + 0.5) * lon_step, precision)
+                for i in rows for j in columns
+            }
+            return precision, sorted(cells)
+
+def _candidates(db: Session, precision, cells, start: datetime, end: datetime):
+    params = {
+        "start_hour": rollups.floor_hour(start).strftime(TIMESTAMP_FORMAT),
+        "end": end.strftime(TIMESTAMP_FORMAT),
+    }
+    if precision == PRECISION:
+        results = [db.execute(_IN_CELLS, {**params, "cells": cells})]
+    else:
+        results = [db.execute(_IN_PREFIX, {**params, "prefix": cell}) for cell in cells]
+    candidates = {}
+    for result in results:
+        for ship_id, hour in result:
+            candidates.setdefault(ship_id, set()).add(parse_timestamp(hour))
+    return candidates
+
+def _ranges(hours, start: datetime, end: datetime):
+    # Consecutive candidate hours merged into [start, end) ranges, clipped to the window
+    ranges = []
+    for hour in sorted(hours):
+        if ranges and ranges[-1][1] == hour:
+            ranges[-1][1] = hour + timedelta(hours=1)
+        else:
+            ranges.append([hour, hour + timedelta(hours=1)])
+    return [(max(a, start), min(b, end)) for a, b in ranges if max(a, start) < min(b, end)]
+
+def _fixes(db: Session, ship_id: int, ranges):
+    for range_start, range_end in ranges:
+        result = db.execute(_FIXES, {
+            "ship_id": ship_id,
+            "start": range_start.strftime(TIMESTAMP_FORMAT),
+            "end": range_end.strftime(TIMESTAMP_FORMAT),
+        })
+        for timestamp, lat, lon in result:
+            yield parse_timestamp(timestamp), lat, lon
+    # Archived days are decoded once and filtered to the candidate ranges
+    for day, _ in archive.chunks_in_range(db, ship_id, ranges[0][0], ranges[-1][1]):
+        day_end = day + timedelta(days=1)
+        day_ranges = [(a, b) for a, b in ranges if a < day_end and b > day]
+        if not day_ranges:
+            continue
+        for r in archive.load_chunk(db, ship_id, day, day_ranges[0][0], day_ranges[-1][1] - timedelta(microseconds=1)):
+            if any(a <= r.timestamp < b for a, b in day_ranges):
+                yield r.timestamp, r.latitude, r.longitude
+
+def get_nearby(db: Session, lat: float, lon: float, radius_km: float, start: datetime, end: datetime):
+    precision, cells = cover(lat, lon, radius_km)
+    candidates = _candidates(db, precision, cells, start, end)
+    ships = {ship.id: ship for ship in db.query(models.Ship).filter(models.Ship.id.in_(candidates))}
+    found, unverified = [], []
+    for ship_id, hours in sorted(candidates.items()):
+        ship = ships[ship_id]
+        ranges = _ranges(hours, start, end)
+        if not ranges:
+            continue
+        match = None
+        loaded = 0
+        for timestamp, fix_lat, fix_lon in _fixes(db, ship_id, ranges):
+            loaded += 1
+            if not geo.valid(fix_lat, fix_lon):
+                continue
+            distance = geo.haversine_km(lat, lon, fix_lat, fix_lon)
+            if distance > radius_km:
+                continue
+            if match is None:
+                match = {
+                    "ship_id": ship_id, "mmsi": ship.mmsi, "name": ship.name, "fixes": 0,
+                    "first_timestamp": timestamp, "last_timestamp": timestamp, "closest_km": distance,
+                    "closest_timestamp": timestamp, "latitude": fix_lat, "longitude": fix_lon,
+                }
+            match["fixes"] += 1
+            match["first_timestamp"] = min(match["first_timestamp"], timestamp)
+            match["last_timestamp"] = max(match["last_timestamp"], timestamp)
+            if distance < match["closest_km"]:
+                match.update(closest_km=distance, closest_timestamp=timestamp, latitude=fix_lat, longitude=fix_lon)
+        if match is not None:
+            found.append(match)
+        elif not loaded:
+            unverified.append({
+                "ship_id": ship_id, "mmsi": ship.mmsi, "name": ship.name,
+                "first_hour": min(hours), "last_hour": max(hours),
+            })
+    found.sort(key=lambda m: m["closest_km"])
+    return {
+        "lat": lat,
+        "lon": lon,
+        "radius_km": radius_km,
+        "start": start,
+        "end": end,
+        "candidates": len(candidates),
+        "ships": found,
+        "unverified": unverified,
+    }
+
+def rebuild(db: Session, start: datetime, end: datetime, log=print):
+    # Recomputes whole days from raw and archived telemetry, one ship at a time.
+    # Ship-days that retention has partly reduced to rollups keep their index
+    # entries: the fixes behind them are gone.
+    start, end = rollups.floor_day(start), rollups.floor_day(end) + timedelta(days=1)
+    aged = {}
+    for ship_id, day in rollups.aged_days(db, start, end):
+        aged.setdefault(ship_id, set()).add(day)
+    total = 0
+    for ship in db.query(models.Ship).order_by(models.Ship.id).all():
+        kept = aged.get(ship.id, set())
+        for range_start, range_end in rollups.day_ranges(start, end, kept):
+            db.query(models.TrackCell).filter(
+                models.TrackCell.ship_id == ship.id, models.TrackCell.hour >= range_start, models.TrackCell.hour < range_end
+            ).delete()
+        fixes = crud.get_fixes(db, ship.id, start, end)
+        cells = {}
+        _accumulate(cells, ship.id, fixes)
+        cells = {key: value for key, value in cells.items() if rollups.floor_day(key[1]) not in kept}
+        _write(db, cells)
+        total += len(cells)
+        log(f"{ship.mmsi}: {len(fixes)} fixes in {len(cells)} cell-hours")
+    db.commit()
+    return total
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the spatio-temporal track index")
+    parser.add_argument("--rebuild", action="store_true", help="recompute the index from stored telemetry")
+    parser.add_argument("--days", type=int, default=90, help="how many days back to rebuild")
+    args = parser.parse_args()
+    if not args.rebuild:
+        parser.error("nothing to do (use --rebuild)")
+
+    migrations.run(engine)
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        cells = rebuild(db, now - timedelta(days=args.days), now)
+        print(f"Rebuilt {cells} cell-hours")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# database.py opens ./sql_app.db on import, so every test session gets its own
+# scratch directory before any backend module is loaded
+os.chdir(tempfile.mkdtemp(prefix="ship_tests_"))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import crud, migrations, schemas
+from database import SessionLocal, engine
+
+migrations.run(engine)
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+@pytest.fixture(scope="session")
+def client():
+    # No lifespan: migrations already ran above and the rings fill on demand
+    from fastapi.testclient import TestClient
+    import main
+    return TestClient(main.app)
+
+@pytest.fixture(scope="session")
+def auth(client):
+    session = SessionLocal()
+    try:
+        crud.create_user(session, schemas.UserCreate(username="tester", password="secret"))
+    finally:
+        session.close()
+    token = client.post("/token", data={"username": "tester", "password": "secret"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
@@ -0,0 +1,39 @@
+from datetime import datetime, timedelta
+import math
+
+import anomaly, ingest
+
+T0 = datetime(2026, 10, 3)
+
+def _steady(state, count, start=0):
+    for i in range(start, start + count):
+        assert state.observe(T0 + timedelta(minutes=i), 1000.0 + i % 5, 10.0, 50.0 + i % 3) == []
+
+def test_fuel_spike_at_constant_rpm():
+    state = anomaly._ShipState()
+    _steady(state, anomaly.WARMUP_SAMPLES + 10)
+    (alert,) = state.observe(T0 + timedelta(hours=1), 1002.0, 10.0, 120.0)
+    assert alert[:3] == ("fuel_spike", "fuel_consumption", 120.0)
+
+def test_non_finite_samples_are_skipped():
+    state = anomaly._ShipState()
+    _steady(state, anomaly.WARMUP_SAMPLES + 10)
+    mean = state.fuel_consumption.mean
+    assert state.observe(T0 + timedelta(minutes=50), float("nan"), 10.0, float("inf")) == []
+    assert state.fuel_consumption.mean == mean and math.isfinite(state.rpm.var)
+    (alert,) = state.observe(T0 + timedelta(minutes=51), 1002.0, 10.0, 120.0)
+    assert alert[0] == "fuel_spike"
+
+def test_out_of_order_sample_is_not_scored():
+    state = anomaly._ShipState()
+    _steady(state, anomaly.WARMUP_SAMPLES + 10)
+    assert state.observe(T0, 1002.0, 10.0, 500.0) == []
+
+def test_alerts_stored_with_ingest(db):
+    ship_id = ingest.resolve_ships(db, ["N1"])["N1"]
+    rows = [(ship_id, T0 + timedelta(minutes=i), 1000.0 + i % 5, 10.0, 50.0 + i % 3, 10.5, 106.7, 90.0)
+            for i in range(anomaly.WARMUP_SAMPLES + 10)]
+    assert ingest.write_rows(db, rows)["alerts"] == 0
+    spike = (ship_id, T0 + timedelta(hours=1), 1002.0, 10.0, 120.0, 10.5, 106.7, 90.0)
+    assert ingest.write_rows(db, [spike])["alerts"] == 1
+    assert [a.kind for a in anomaly.get_alerts(db, ship_id=ship_id)] == ["fuel_spike"]
@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta
+import threading
+
+import pytest
+
+import coalesce
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    with coalesce._lock:
+        for key in list(coalesce._entries):
+            coalesce._remove(key)
+    yield
+
+def test_concurrent_callers_share_one_computation():
+    started, release = threading.Event(), threading.Event()
+    calls = []
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return b"result"
+    results = []
+    leader = threading.Thread(target=lambda: results.append(coalesce.get("k", compute)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(coalesce.get("k", compute))) for _ in range(4)]
+    for t in followers:
+        t.start()
+    release.set()
+    for t in [leader, *followers]:
+        t.join(5)
+    assert results == [b"result"] * 5
+    assert len(calls) == 1
+
+def test_invalidate_drops_tagged_and_fleet_results():
+    coalesce.get("ship", lambda: b"a", tags=(1,))
+    coalesce.get("other", lambda: b"b", tags=(2,))
+    coalesce.get("fleet", lambda: b"c", tags=(coalesce.FLEET,))
+    coalesce.invalidate({1})
+    assert coalesce.get("ship", lambda: b"a2", tags=(1,)) == b"a2"
+    assert coalesce.get("other", lambda: b"b2", tags=(2,)) == b"b"
+    assert coalesce.get("fleet", lambda: b"c2", tags=(coalesce.FLEET,)) == b"c2"
+
+def test_errors_are_not_cached():
+    def fail():
+        raise ValueError("boom")
+    with pytest.raises(ValueError):
+        coalesce.get("err", fail)
+    assert coalesce.get("err", lambda: b"ok") == b"ok"
+
+def test_size_bounds(monkeypatch):
+    coalesce.get("big", lambda: b"x" * (coalesce.MAX_RESULT_BYTES + 1))
+    assert "big" not in coalesce._entries
+    monkeypatch.setattr(coalesce, "MAX_BYTES", 250)
+    for i in range(5):
+        coalesce.get(i, lambda: (b"y" * 100, "text/plain"))
+    assert list(coalesce._entries) == [3, 4]
+    assert coalesce._total_bytes == 200
+
+def test_expired_entries_are_purged():
+    coalesce.get("old", lambda: b"x" * 10, ttl=0)
+    coalesce.get("new", lambda: b"y")
+    assert "old" not in coalesce._entries
+
+def test_write_invalidates_coalesced_reads(client, auth):
+    sample = {"rpm": 1000.0, "speed": 10.0, "fuel_consumption": 50.0, "latitude": 10.5, "longitude": 106.7}
+    t0 = datetime(2026, 10, 5)
+    client.post("/telemetry/C1", json={**sample, "timestamp": t0.isoformat()})
+    first = client.get("/telemetry/C1?limit=5", headers=auth).json()
+    overview = {s["mmsi"]: s for s in client.get("/ships/overview", headers=auth).json()}
+    assert len(first) == 1 and overview["C1"]["last_telemetry"]["id"] == first[0]["id"]
+    created = client.post("/telemetry/C1", json={**sample, "timestamp": (t0 + timedelta(minutes=1)).isoformat()}).json()
+    assert [r["id"] for r in client.get("/telemetry/C1?limit=5", headers=auth).json()] == [created["id"], first[0]["id"]]
+    overview = {s["mmsi"]: s for s in client.get("/ships/overview", headers=auth).json()}
+    assert overview["C1"]["last_telemetry"]["id"] == created["id"]
@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import archive, fleet_stats, ingest
+
+T0 = datetime(2026, 6, 1)
+
+@pytest.fixture(scope="module")
+def archived_ship():
+    from database import SessionLocal
+    db = SessionLocal()
+    ship_id = ingest.resolve_ships(db, ["F1"])["F1"]
+    rows = [(ship_id, T0 + timedelta(minutes=7 * i), 1000.0, 10.0 + i % 3, 50.0, 10.5, 106.7, 90.0) for i in range(600)]
+    ingest.write_rows(db, rows)
+    # First two days go to the archive (and the rollups), the rest stays raw
+    for day in (T0, T0 + timedelta(days=1)):
+        archive.archive_day(db, ship_id, day)
+    db.close()
+    return ship_id, rows
+
+@pytest.mark.parametrize("start, end", [
+    (T0 + timedelta(minutes=95), T0 + timedelta(hours=30, minutes=13)),  # both edges mid-hour
+    (T0 + timedelta(minutes=10), T0 + timedelta(minutes=50)),            # inside one hour
+    (T0 + timedelta(hours=5), T0 + timedelta(hours=9)),                  # aligned
+    (T0 + timedelta(hours=40, minutes=30), T0 + timedelta(hours=60)),    # archived into raw
+    (T0 + timedelta(minutes=95), None),
+])
+def test_window_totals_match_samples(db, archived_ship, start, end):
+    ship_id, rows = archived_ship
+    expected = [r for r in rows if r[1] >= start and (end is None or r[1] < end)]
+    (ship,) = [s for s in fleet_stats.get_fleet_stats(db, start, end)["ships"] if s["ship_id"] == ship_id]
+    assert ship["samples"] == len(expected)
+    assert ship["avg_speed"] == pytest.approx(sum(r[3] for r in expected) / len(expected))
+    assert ship["first_timestamp"] == expected[0][1]
+    assert ship["last_timestamp"] == expected[-1][1]
+
+def test_refresh_picks_up_new_rows(db, archived_ship):
+    ship_id, rows = archived_ship
+    start = T0 + timedelta(minutes=95)
+    before = [s for s in fleet_stats.get_fleet_stats(db, start)["ships"] if s["ship_id"] == ship_id][0]["samples"]
+    ingest.write_rows(db, [(ship_id, rows[-1][1] + timedelta(minutes=1), 1000.0, 12.0, 50.0, 10.5, 106.7, 90.0)])
+    after = [s for s in fleet_stats.get_fleet_stats(db, start)["ships"] if s["ship_id"] == ship_id][0]["samples"]
+    assert after == before + 1
@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta
+from array import array
+import struct
+
+import pytest
+
+import serialize
+
+T0 = datetime(2026, 10, 7)
+
+@pytest.fixture(scope="module")
+def stored(client):
+    client.post("/telemetry/batch", json=[
+        {"mmsi": "R1", "timestamp": (T0 + timedelta(seconds=30 * i, microseconds=i)).isoformat(), "rpm": 1000.0 + i,
+         "speed": 10.0, "fuel_consumption": 50.0, "latitude": 10.5, "longitude": 106.7,
+         "heading": None if i % 4 == 0 else 90.0}
+        for i in range(40)
+    ])
+
+@pytest.mark.parametrize("limit", [5, 40, 1000])
+def test_columnar_and_binary_match_rows(client, auth, stored, limit):
+    rows = client.get(f"/telemetry/R1?limit={limit}", headers=auth).json()
+    columnar = client.get(f"/telemetry/R1?limit={limit}&format=columnar", headers=auth).json()
+    binary = client.get(f"/telemetry/R1?limit={limit}&format=binary", headers=auth)
+    assert binary.headers["content-type"] == serialize.BINARY
+    assert columnar["count"] == len(rows) == min(limit, 40)
+    for name in serialize.COLUMNS:
+        if name == "timestamp":
+            expected = [serialize.epoch_ms(datetime.fromisoformat(r["timestamp"])) for r in rows]
+        else:
+            expected = [r[name] for r in rows]
+        assert columnar[name] == expected
+
+    magic, count = struct.unpack_from("<4sI", binary.content)
+    assert (magic, count) == (serialize.BINARY_MAGIC, len(rows))
+    columns = array("d", binary.content[8:])
+    for i, name in enumerate(serialize.COLUMNS):
+        values = [None if v != v else v for v in columns[i * count:(i + 1) * count]]
+        assert values == [float(v) if v is not None else None for v in columnar[name]]
+
+def test_rows_match_response_model(client, auth, stored):
+    (row,) = client.get("/telemetry/R1?limit=1", headers=auth).json()
+    assert list(row) == ["rpm", "speed", "fuel_consumption", "latitude", "longitude", "heading", "id", "ship_id", "timestamp"]
+    assert datetime.fromisoformat(row["timestamp"]) == T0 + timedelta(seconds=30 * 39, microseconds=39)
+
+def test_unknown_format(client, auth, stored):
+    assert client.get("/telemetry/R1?format=xml", headers=auth).status_code == 400
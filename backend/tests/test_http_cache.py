@@ -0,0 +1,42 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+T0 = datetime(2026, 10, 6)
+
+def _post(client, mmsi, minutes):
+    return client.post(f"/telemetry/{mmsi}", json={
+        "timestamp": (T0 + timedelta(minutes=minutes)).isoformat(), "rpm": 1000.0, "speed": 10.0,
+        "fuel_consumption": 50.0, "latitude": 10.5, "longitude": 106.7,
+    })
+
+@pytest.mark.parametrize("path", [
+    "/telemetry/H1?limit=10",
+    "/telemetry/H1?limit=10&format=columnar",
+    "/ships/overview",
+    f"/telemetry?mmsi=H1&start_date={T0.isoformat()}&end_date={(T0 + timedelta(hours=2)).isoformat()}&bucket=600",
+])
+def test_not_modified_round_trip(client, auth, path):
+    for minutes in range(3):
+        _post(client, "H1", minutes)
+    first = client.get(path, headers=auth)
+    etag = first.headers["etag"]
+    assert first.status_code == 200 and etag
+    cached = client.get(path, headers={**auth, "If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["etag"] == etag and cached.content == b""
+    # New telemetry changes the version, so the old tag gets a full answer
+    _post(client, "H1", 10 + len(path))
+    fresh = client.get(path, headers={**auth, "If-None-Match": etag})
+    assert fresh.status_code == 200
+    assert fresh.headers["etag"] != etag
+
+def test_large_responses_are_compressed(client, auth):
+    client.post("/telemetry/batch", json=[
+        {"mmsi": "H2", "timestamp": (T0 + timedelta(minutes=i)).isoformat(), "rpm": 1000.0 + i, "speed": 10.0,
+         "fuel_consumption": 50.0, "latitude": 10.5, "longitude": 106.7}
+        for i in range(100)
+    ])
+    reply = client.get("/telemetry/H2?limit=100", headers={**auth, "Accept-Encoding": "gzip"})
+    assert reply.headers["content-encoding"] == "gzip"
+    assert len(reply.json()) == 100
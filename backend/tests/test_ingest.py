@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta
+
+import crud, heatmap, ingest, models, wire
+
+T0 = datetime(2026, 10, 2)
+
+def _row(ship_id, minutes, lat=10.5, lon=106.7):
+    return (ship_id, T0 + timedelta(minutes=minutes), 1000.0, 10.0, 50.0, lat, lon, 90.0)
+
+def _item(mmsi, minutes):
+    return {"mmsi": mmsi, "timestamp": (T0 + timedelta(minutes=minutes)).isoformat(), "rpm": 1000.0,
+            "speed": 10.0, "fuel_consumption": 50.0, "latitude": 10.5, "longitude": 106.7, "heading": 90.0}
+
+def _stored(db, ship_id):
+    return db.query(models.Telemetry).filter(models.Telemetry.ship_id == ship_id).count()
+
+def test_retried_batch_is_not_stored_twice(client, db):
+    items = [_item("I1", i) for i in range(10)]
+    assert client.post("/telemetry/batch", json=items).json()["inserted"] == 10
+    # The spool resends after a lost reply, with two new samples appended
+    retry = client.post("/telemetry/batch", json=items + [_item("I1", 10), _item("I1", 11)])
+    assert retry.json() == {"received": 12, "inserted": 2, "alerts": 0}
+    assert _stored(db, crud.get_ship(db, "I1").id) == 12
+
+def test_batch_samples_without_timestamp_are_all_stored(client, db):
+    items = [{k: v for k, v in _item("I6", i).items() if k != "timestamp"} for i in range(5)]
+    assert client.post("/telemetry/batch", json=items).json()["inserted"] == 5
+    packed = wire.encode_packed({"I6": [(None, 1000.0, 10.0, 50.0, 10.5, 106.7, 90.0)] * 3})
+    reply = client.post("/telemetry/batch", content=packed, headers={"Content-Type": wire.PACKED})
+    assert reply.json()["inserted"] == 3
+    assert _stored(db, crud.get_ship(db, "I6").id) == 8
+
+def test_duplicates_within_a_batch(db):
+    ship_id = ingest.resolve_ships(db, ["I2"])["I2"]
+    result = ingest.write_rows(db, [_row(ship_id, 0), _row(ship_id, 1), _row(ship_id, 0)])
+    assert result["inserted"] == 2
+    assert _stored(db, ship_id) == 2
+
+def test_single_sample_retry_returns_existing_row(client):
+    sample = {"timestamp": T0.isoformat(), "rpm": 1000.0, "speed": 10.0, "fuel_consumption": 50.0,
+              "latitude": 10.5, "longitude": 106.7}
+    first = client.post("/telemetry/I3", json=sample)
+    again = client.post("/telemetry/I3", json=sample)
+    assert first.status_code == again.status_code == 200
+    assert first.json()["id"] == again.json()["id"]
+
+def _dwell(db, ship_lat):
+    # (dwell seconds, samples) summed over the cells around ship_lat on day T0
+    cells = [c for c in heatmap.get_heatmap(db, 6, T0, T0 + timedelta(days=1))["cells"] if abs(c["lat"] - ship_lat) < 0.01]
+    return sum(c["dwell_seconds"] for c in cells), sum(c["samples"] for c in cells)
+
+def test_late_sample_does_not_double_count_dwell(db):
+    # Each ship gets its own spot on the map so the day's cells can be told apart
+    lat = 11.25
+    ship_id = ingest.resolve_ships(db, ["I4"])["I4"]
+    ingest.write_rows(db, [_row(ship_id, 0, lat), _row(ship_id, 8, lat)])
+    assert _dwell(db, lat) == (480.0, 2)
+    # A late fix between the two splits the gap instead of adding to it
+    ingest.write_rows(db, [_row(ship_id, 4, lat)])
+    assert _dwell(db, lat) == (480.0, 3)
+    # Redelivering it changes nothing
+    ingest.write_rows(db, [_row(ship_id, 4, lat)])
+    assert _dwell(db, lat) == (480.0, 3)
+
+def test_late_samples_match_rebuild(db):
+    lat = 11.75
+    ship_id = ingest.resolve_ships(db, ["I5"])["I5"]
+    ingest.write_rows(db, [_row(ship_id, m, lat, 106.7 + m * 0.002) for m in range(0, 60, 6)])
+    ingest.write_rows(db, [_row(ship_id, m, lat, 106.7 + m * 0.002) for m in (3, 21, 57, 63)])
+    incremental = heatmap.get_heatmap(db, 7, T0, T0 + timedelta(days=1))["cells"]
+    heatmap.rebuild(db, T0, T0, log=lambda *args: None)
+    rebuilt = heatmap.get_heatmap(db, 7, T0, T0 + timedelta(days=1))["cells"]
+    assert sorted((c["geohash"], c["samples"], c["dwell_seconds"]) for c in incremental) == \
+        sorted((c["geohash"], c["samples"], c["dwell_seconds"]) for c in rebuilt)
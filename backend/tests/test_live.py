@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import crud, ingest, live
+
+T0 = datetime(2026, 10, 4)
+
+def _rows(ship_id, minutes):
+    return [(ship_id, T0 + timedelta(minutes=m), 1000.0 + m, 10.0, 50.0, 10.5, 106.7, None if m % 7 == 0 else 90.0)
+            for m in minutes]
+
+def _parity(db, ship_id, limit, start=None, end=None):
+    version = crud.get_telemetry_version(db, ship_id)
+    recent = live.get_recent(db, ship_id, version, limit, start, end)
+    stored = crud.get_telemetry(db, ship_id, limit=limit, start_date=start, end_date=end)
+    # None means the ring cannot answer and the endpoint falls back to SQL
+    if recent is not None:
+        assert recent == stored
+    return recent
+
+@pytest.mark.parametrize("limit", [0, 1, 50, live.RING_SIZE])
+def test_ring_matches_sql(db, limit):
+    ship_id = ingest.resolve_ships(db, [f"L{limit}"])[f"L{limit}"]
+    ingest.write_rows(db, _rows(ship_id, range(0, 600, 2)))
+    assert _parity(db, ship_id, limit) is not None
+    # Late samples land inside the ring; one older than the whole ring is left out
+    ingest.write_rows(db, _rows(ship_id, [501, 555, 3]))
+    assert _parity(db, ship_id, limit) is not None
+    assert _parity(db, ship_id, limit, T0 + timedelta(minutes=520), T0 + timedelta(minutes=560)) is not None
+    _parity(db, ship_id, limit, T0)  # served by the ring or SQL depending on limit; either way the same rows
+    # Windows older than the ring's oldest sample go to SQL
+    assert _parity(db, ship_id, limit, T0, T0 + timedelta(minutes=60)) == ([] if limit == 0 else None)
+
+def test_limit_zero_and_negative(client, auth):
+    client.post("/telemetry/batch", json=[
+        {"mmsi": "L-endpoint", "timestamp": (T0 + timedelta(minutes=i)).isoformat(), "rpm": 1000.0, "speed": 10.0,
+         "fuel_consumption": 50.0, "latitude": 10.5, "longitude": 106.7}
+        for i in range(5)
+    ])
+    empty = client.get("/telemetry/L-endpoint?limit=0", headers=auth)
+    assert empty.status_code == 200 and empty.json() == []
+    assert client.get("/telemetry/L-endpoint?limit=-1", headers=auth).status_code == 400
+    assert len(client.get("/telemetry/L-endpoint?limit=3", headers=auth).json()) == 3
+
+def test_ring_query_limit_zero():
+    ring = live.Ring(1, size=4)
+    assert ring.query(0) is None  # nothing known yet: the answer depends on SQL
+    ring.load([(1, 1, T0, 1.0, 2.0, 3.0, 4.0, 5.0, 6.0)], complete=True)
+    assert ring.query(0) == []
+    assert len(ring.query(5)) == 1
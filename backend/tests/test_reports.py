@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta
+import os
+
+import pytest
+
+import archive, geo, ingest, reports
+
+T0 = datetime(2026, 3, 1)
+
+@pytest.fixture(scope="module")
+def voyage():
+    from database import SessionLocal
+    db = SessionLocal()
+    ship_id = ingest.resolve_ships(db, ["T1"])["T1"]
+    # Under way for two days at one fix a minute, then three hours alongside
+    rows = [(ship_id, T0 + timedelta(minutes=m), 1500.0, 12.0, 60.0, 10.0 + m * 1e-3, 106.0, 0.0) for m in range(2880)]
+    rows += [(ship_id, T0 + timedelta(minutes=m), 0.0, 0.0, 0.0, rows[-1][5], 106.0, 0.0) for m in range(2880, 3060)]
+    ingest.write_rows(db, rows)
+    db.close()
+    return ship_id, rows
+
+def test_ship_report_matches_samples(db, voyage):
+    ship_id, rows = voyage
+    start, end = T0, T0 + timedelta(days=3)
+    report = reports.ship_report(ship_id, start, end)
+    distance_km = sum(geo.haversine_km(a[5], a[6], b[5], b[6]) for a, b in zip(rows, rows[1:]))
+    assert report["samples"] == len(rows)
+    assert report["distance_nm"] == pytest.approx(distance_km / reports.KM_PER_NM, abs=1e-3)
+    assert report["engine_hours"] == pytest.approx(2880 / 60)
+    assert report["fuel_liters"] == pytest.approx(60.0 * 2880 / 60)
+    assert report["port_calls"] == 1
+    # Archived days give the same report as raw ones
+    archive.archive_day(db, ship_id, T0)
+    archive.archive_day(db, ship_id, T0 + timedelta(days=1))
+    assert reports.ship_report(ship_id, start, end) == report
+
+def test_report_endpoint(client, auth, voyage):
+    window = f"start_date={T0.isoformat()}&end_date={(T0 + timedelta(days=3)).isoformat()}"
+    for workers in (0, (os.cpu_count() or 1) + 1):
+        assert client.get(f"/reports/fleet?{window}&workers={workers}", headers=auth).status_code == 400
+    reply = client.get(f"/reports/fleet?{window}&workers=1", headers=auth)
+    assert reply.status_code == 200
+    assert {s["mmsi"]: s["samples"] for s in reply.json()["ships"]}["T1"] == len(voyage[1])
+    csv = client.get(f"/reports/fleet?{window}&format=csv", headers=auth)
+    assert csv.headers["content-type"].startswith("text/csv")
+    # Only the CLI writes artifact files
+    assert not os.path.exists(reports.reports_dir())
@@ -0,0 +1,46 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import crud, ingest, series
+
+T0 = datetime(2026, 10, 8)
+
+def _ship(db, mmsi, minutes, rpm=lambda m: 1000.0 + m):
+    ship_id = ingest.resolve_ships(db, [mmsi])[mmsi]
+    ingest.write_rows(db, [(ship_id, T0 + timedelta(minutes=m), rpm(m), 10.0, 50.0, 10.5, 106.7, 90.0) for m in minutes])
+    return crud.get_ship(db, mmsi)
+
+@pytest.mark.parametrize("bucket", [60, 600, 3600])
+def test_buckets_average_their_samples(db, bucket):
+    minutes = [m for m in range(0, 180, 3) if m % 40 < 30]
+    ships = [_ship(db, f"Q{bucket}a", minutes), _ship(db, f"Q{bucket}b", minutes[::2], rpm=lambda m: 2000.0)]
+    result = series.get_series(db, ships, T0, T0 + timedelta(hours=3), bucket)
+    assert len(result["timestamps"]) == 3 * 3600 // bucket
+    for ship, entry in zip(ships, result["series"]):
+        assert entry["mmsi"] == ship.mmsi
+        ship_minutes = minutes if ship is ships[0] else minutes[::2]
+        for slot, start in enumerate(result["timestamps"]):
+            inside = [m for m in ship_minutes if start <= T0 + timedelta(minutes=m) < start + timedelta(seconds=bucket)]
+            assert entry["samples"][slot] == len(inside)
+            expected = (sum(1000.0 + m for m in inside) / len(inside) if ship is ships[0] else 2000.0) if inside else None
+            assert entry["rpm"][slot] == pytest.approx(expected)
+
+def test_fill_previous_holds_values_within_the_hold(db):
+    # A deadband sender: samples at 0 and 25 minutes only
+    ship = _ship(db, "Q-fill", [0, 25])
+    plain = series.get_series(db, [ship], T0, T0 + timedelta(minutes=30), 300)["series"][0]
+    filled = series.get_series(db, [ship], T0, T0 + timedelta(minutes=30), 300, fill="previous")["series"][0]
+    assert plain["rpm"] == [1000.0, None, None, None, None, 1025.0]
+    # Held for FILL_HOLD (10 minutes) after the last sample, then treated as an outage
+    assert filled["rpm"] == [1000.0, 1000.0, 1000.0, None, None, 1025.0]
+    assert filled["samples"] == plain["samples"] == [1, 0, 0, 0, 0, 1]
+
+def test_series_endpoint_validation(client, auth, db):
+    _ship(db, "Q-endpoint", [0, 5])
+    window = f"start_date={T0.isoformat()}&end_date={(T0 + timedelta(days=30)).isoformat()}"
+    assert client.get(f"/telemetry?mmsi=nope&{window}", headers=auth).status_code == 404
+    assert client.get(f"/telemetry?mmsi=Q-endpoint&{window}&bucket=60", headers=auth).status_code == 400
+    assert client.get(f"/telemetry?mmsi=Q-endpoint&{window}&fill=linear", headers=auth).status_code == 400
+    columnar = client.get(f"/telemetry?mmsi=Q-endpoint&{window}&bucket=86400&format=columnar", headers=auth).json()
+    assert columnar["timestamps"][0] == (T0 - datetime(1970, 1, 1)) // timedelta(milliseconds=1)
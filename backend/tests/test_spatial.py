@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta
+import random
+
+import pytest
+
+import archive, geo, ingest, spatial
+
+T0 = datetime(2026, 4, 1)
+WINDOW = (T0, T0 + timedelta(days=3))
+
+@pytest.fixture(scope="module")
+def tracks():
+    # Ships wandering around a few hot spots, including both sides of the
+    # antimeridian and near a pole; the first day is archived
+    from database import SessionLocal
+    db = SessionLocal()
+    rng = random.Random(7)
+    spots = [(10.5, 106.7), (-33.9, 179.95), (-33.9, -179.95), (78.0, 15.0), (0.0, 0.0)]
+    stored = {}
+    ids = ingest.resolve_ships(db, [f"P{i}" for i in range(12)])
+    for i, (mmsi, ship_id) in enumerate(sorted(ids.items())):
+        lat, lon = spots[i % len(spots)]
+        rows = []
+        for n in range(400):
+            lat = max(-89.0, min(89.0, lat + rng.uniform(-0.02, 0.02)))
+            lon = (lon + rng.uniform(-0.03, 0.03) + 180.0) % 360.0 - 180.0
+            rows.append((ship_id, T0 + timedelta(minutes=10 * n), 1000.0, 10.0, 50.0, lat, lon, 0.0))
+        ingest.write_rows(db, rows)
+        archive.archive_day(db, ship_id, T0)
+        stored[mmsi] = [(r[1], r[5], r[6]) for r in rows]
+    db.close()
+    return stored
+
+def _brute_force(tracks, lat, lon, radius_km, start, end):
+    found = {}
+    for mmsi, fixes in tracks.items():
+        distances = [
+            (geo.haversine_km(lat, lon, fix_lat, fix_lon), timestamp)
+            for timestamp, fix_lat, fix_lon in fixes if start <= timestamp < end
+        ]
+        inside = [d for d in distances if d[0] <= radius_km]
+        if inside:
+            found[mmsi] = (len(inside), min(inside)[0])
+    return found
+
+def test_near_matches_brute_force(db, tracks):
+    rng = random.Random(11)
+    spots = [fix for fixes in tracks.values() for fix in fixes[::40]]
+    for _ in range(100):
+        _, lat, lon = rng.choice(spots)
+        lat += rng.uniform(-0.2, 0.2)
+        lon = (lon + rng.uniform(-0.2, 0.2) + 180.0) % 360.0 - 180.0
+        radius_km = rng.choice([0.5, 2.0, 10.0, 40.0, 150.0])
+        start = WINDOW[0] + timedelta(hours=rng.randint(0, 60))
+        end = start + timedelta(hours=rng.randint(1, 30))
+        result = spatial.get_nearby(db, max(-90.0, min(90.0, lat)), lon, radius_km, start, end)
+        got = {s["mmsi"]: (s["fixes"], s["closest_km"]) for s in result["ships"] if s["mmsi"] in tracks}
+        expected = _brute_force(tracks, max(-90.0, min(90.0, lat)), lon, radius_km, start, end)
+        assert got.keys() == expected.keys()
+        for mmsi, (fixes, closest) in expected.items():
+            assert got[mmsi][0] == fixes
+            assert got[mmsi][1] == pytest.approx(closest)
+
+def test_near_across_antimeridian(db, tracks):
+    result = spatial.get_nearby(db, -33.9, 180.0, 50.0, *WINDOW)
+    expected = _brute_force(tracks, -33.9, 180.0, 50.0, *WINDOW)
+    assert {s["mmsi"] for s in result["ships"] if s["mmsi"] in tracks} == set(expected)
+    # Matches come from both sides of the date line
+    sides = {s["longitude"] > 0 for s in result["ships"] if s["mmsi"] in tracks}
+    assert sides == {True, False}
+
+def test_near_endpoint(client, auth, tracks):
+    _, lat, lon = tracks["P0"][100]
+    params = {"lat": lat, "lon": lon, "radius_km": 1.0,
+              "start_date": WINDOW[0].isoformat(), "end_date": WINDOW[1].isoformat()}
+    reply = client.get("/fleet/near", params=params, headers=auth)
+    assert reply.status_code == 200
+    assert "P0" in [s["mmsi"] for s in reply.json()["ships"]]
+    assert client.get("/fleet/near", params={**params, "radius_km": 0}, headers=auth).status_code == 400
@@ -0,0 +1,46 @@
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+import pytest
+
+import startup
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture
+def fresh_state(monkeypatch):
+    monkeypatch.setattr(startup, "state", {"migrations": "pending", "live": "pending", "phases": {}})
+
+def test_ready_after_lifespan(fresh_state):
+    from fastapi.testclient import TestClient
+    import main
+    bare = TestClient(main.app)
+    assert bare.get("/ready").status_code == 503
+    with TestClient(main.app) as client:
+        deadline = time.monotonic() + 10
+        while (reply := client.get("/ready")).status_code != 200 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert reply.status_code == 200
+        assert reply.json()["migrations"] == "done" and reply.json()["live"] == "warm"
+        assert set(reply.json()["phases"]) == {"migrations", "live_warm"}
+
+def test_migrations_can_be_skipped(fresh_state, monkeypatch):
+    from fastapi.testclient import TestClient
+    import main
+    monkeypatch.setenv(startup.MIGRATE_ENV, "0")
+    with TestClient(main.app):
+        assert startup.state["migrations"] == "skipped"
+
+def test_importing_main_touches_no_schema():
+    directory = tempfile.mkdtemp()
+    code = "import sys; import main; print(sorted(m for m in ('numpy', 'msgpack', 'zstandard') if m in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", code], cwd=directory, env={**os.environ, "PYTHONPATH": BACKEND},
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"
+    path = os.path.join(directory, "sql_app.db")
+    tables = sqlite3.connect(path).execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall() if os.path.exists(path) else []
+    assert tables == []
@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta
+import gzip
+import json
+
+from fastapi import HTTPException
+import msgpack
+import pytest
+import zstandard
+
+import wire
+
+T0 = datetime(2026, 10, 1)
+
+def _items(mmsi, count):
+    return [
+        {"mmsi": mmsi, "timestamp": (T0 + timedelta(minutes=i)).isoformat(), "rpm": 1000.0 + i, "speed": 10.0,
+         "fuel_consumption": 50.0, "latitude": 10.5, "longitude": 106.7, "heading": 90.0}
+        for i in range(count)
+    ]
+
+def test_formats_decode_to_identical_records():
+    items = _items("W1", 3)
+    positional = [
+        [i["mmsi"], (T0 + timedelta(minutes=n) - wire.EPOCH).total_seconds(), i["rpm"], i["speed"],
+         i["fuel_consumption"], i["latitude"], i["longitude"], i["heading"]]
+        for n, i in enumerate(items)
+    ]
+    packed = wire.encode_packed({"W1": [
+        (T0 + timedelta(minutes=n), i["rpm"], i["speed"], i["fuel_consumption"], i["latitude"], i["longitude"], i["heading"])
+        for n, i in enumerate(items)
+    ]})
+    expected = wire.decode(wire.JSON, json.dumps(items).encode())
+    assert [r[1] for r in expected] == [T0 + timedelta(minutes=n) for n in range(3)]
+    assert wire.decode(wire.MSGPACK, msgpack.packb(items)) == expected
+    assert wire.decode(wire.MSGPACK, msgpack.packb(positional)) == expected
+    assert wire.decode(wire.PACKED, packed) == expected
+
+def test_positional_msgpack_accepts_null_heading():
+    body = msgpack.packb([["W2", 1_790_000_000, 1000, 10, 50, 10.5, 106.7, None]])
+    (record,) = wire.decode(wire.MSGPACK, body)
+    assert record[7] is None
+
+@pytest.mark.parametrize("timestamp", [1e20, float("nan")])
+def test_positional_msgpack_out_of_range_timestamp(timestamp):
+    body = msgpack.packb([["W3", timestamp, 1000, 10, 50, 10.5, 106.7, 90]])
+    with pytest.raises(HTTPException) as e:
+        wire.decode(wire.MSGPACK, body)
+    assert e.value.status_code == 400
+
+def test_packed_out_of_range_timestamp():
+    body = wire.encode_packed({"W4": [(None, 1000.0, 10.0, 50.0, 10.5, 106.7, 90.0)]})
+    body = body[:-wire.RECORD.size] + wire.RECORD.pack(2 ** 62, 1000.0, 10.0, 50.0, 10.5, 106.7, 90.0)
+    with pytest.raises(HTTPException) as e:
+        wire.decode(wire.PACKED, body)
+    assert e.value.status_code == 400
+
+def test_packed_trailing_bytes():
+    body = wire.encode_packed({"W5": [(T0, 1000.0, 10.0, 50.0, 10.5, 106.7, 90.0)]}) + b"\0"
+    with pytest.raises(HTTPException) as e:
+        wire.decode(wire.PACKED, body)
+    assert e.value.status_code == 400
+
+def test_batch_endpoint_formats(client):
+    gzipped = client.post(
+        "/telemetry/batch", content=gzip.compress(json.dumps(_items("W6", 5)).encode()),
+        headers={"Content-Type": wire.JSON, "Content-Encoding": "gzip"},
+    )
+    assert gzipped.status_code == 200
+    assert gzipped.json()["inserted"] == 5
+    out_of_range = client.post(
+        "/telemetry/batch", content=msgpack.packb([["W6", 1e20, 1000, 10, 50, 10.5, 106.7, 90]]),
+        headers={"Content-Type": wire.MSGPACK},
+    )
+    assert out_of_range.status_code == 400
+    unsupported = client.post("/telemetry/batch", content=b"x", headers={"Content-Type": "text/plain"})
+    assert unsupported.status_code == 415
+
+@pytest.mark.parametrize("encoding", ["gzip", "zstd"])
+def test_concatenated_members_and_frames(encoding):
+    compress = gzip.compress if encoding == "gzip" else zstandard.ZstdCompressor().compress
+    assert wire.decompress(compress(b"[1,2,") + compress(b"3]"), encoding) == b"[1,2,3]"
+
+@pytest.mark.parametrize("encoding", ["gzip", "zstd"])
+def test_size_cap_covers_all_members(monkeypatch, encoding):
+    compress = gzip.compress if encoding == "gzip" else zstandard.ZstdCompressor().compress
+    monkeypatch.setattr(wire, "MAX_DECOMPRESSED_BYTES", 1000)
+    assert len(wire.decompress(compress(b"a" * 500) + compress(b"b" * 500), encoding)) == 1000
+    with pytest.raises(HTTPException) as e:
+        wire.decompress(compress(b"a" * 600) + compress(b"b" * 600), encoding)
+    assert e.value.status_code == 413
+
+def test_truncated_gzip_member():
+    body = gzip.compress(b"[1,") + gzip.compress(b"2]")
+    for truncated in (body[:-3], b""):
+        with pytest.raises(HTTPException) as e:
+            wire.decompress(truncated, "gzip")
+        assert e.value.status_code == 400
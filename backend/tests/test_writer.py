@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta
+import os
+import tempfile
+import threading
+
+import pytest
+
+import ingest, models, writer
+
+T0 = datetime(2026, 10, 9)
+
+@pytest.fixture(scope="module")
+def server():
+    address = os.path.join(tempfile.mkdtemp(), "writer.sock")
+    instance = writer.Writer(address, linger=0.05)
+    threading.Thread(target=instance.serve_forever, daemon=True).start()
+    for _ in range(200):
+        if os.path.exists(address):
+            break
+        threading.Event().wait(0.01)
+    return instance, address
+
+def _rows(ship_id, minutes):
+    return [(ship_id, T0 + timedelta(minutes=m), 1000.0, 10.0, 50.0, 10.5, 106.7, 90.0) for m in minutes]
+
+def test_writes_are_committed_and_deduplicated(db, server):
+    _, address = server
+    ship_id = ingest.resolve_ships(db, ["V1"])["V1"]
+    client = writer.WriterClient(address)
+    result = client.write(_rows(ship_id, range(10)))
+    assert result["inserted"] == 10 and "rows" not in result
+    assert client.write(_rows(ship_id, range(5, 15)))["inserted"] == 5
+    assert db.query(models.Telemetry).filter_by(ship_id=ship_id).count() == 15
+
+def test_concurrent_requests_share_commits(db, server):
+    instance, address = server
+    ship_ids = ingest.resolve_ships(db, [f"V-{i}" for i in range(8)])
+    client = writer.WriterClient(address)  # one connection per thread
+    commits = instance.commits
+    results = []
+    threads = [
+        threading.Thread(target=lambda ship_id=ship_id: results.append(client.write(_rows(ship_id, range(20)))))
+        for ship_id in ship_ids.values()
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(10)
+    assert sorted(r["inserted"] for r in results) == [20] * 8
+    assert instance.commits - commits < 8
+
+def test_unreachable_writer():
+    client = writer.WriterClient(os.path.join(tempfile.mkdtemp(), "missing.sock"))
+    with pytest.raises(writer.WriterUnavailable):
+        client.write([])
@@ -0,0 +1,173 @@
+from datetime import datetime, timedelta
+from typing import List
+from fastapi import HTTPException
+from fastapi.exceptions import RequestValidationError
+from pydantic import TypeAdapter, ValidationError
+import struct
+import zlib
+import lazy, schemas
+
+msgpack = lazy.load("msgpack", optional=True)
+zstandard = lazy.load("zstandard", optional=True)
+
+# Ingestion wire formats for POST /telemetry/batch. Every decoder returns plain
+# record tuples (mmsi, timestamp, rpm, speed, fuel_consumption, latitude,
+# longitude, heading) so all formats produce identical rows.
+#
+# application/json     - array of TelemetryBatchItem objects
+# application/msgpack  - the same array as MessagePack; elements may also be
+#                        positional arrays in record-tuple order, with the
+#                        timestamp as epoch seconds
+# application/x-ship-telemetry - packed little-endian batch:
+#     header   "SHT1" | u16 segment count
+#     segment  u8 mmsi length | mmsi (utf-8) | u32 record count | records
+#     record   i64 epoch microseconds (0 = server time) | 6 x f64
+#              rpm, speed, fuel_consumption, latitude, longitude, heading
+#     56 bytes per sample versus ~150 for JSON, before compression.
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+PACKED = "application/x-ship-telemetry"
+
+PACKED_MAGIC = b"SHT1"
+_HEADER = struct.Struct("<4sH")
+_COUNT = struct.Struct("<I")
+RECORD = struct.Struct("<q6d")
+
+EPOCH = datetime(1970, 1, 1)
+
+# Refuse to inflate bodies past this size (compression bombs)
+MAX_DECOMPRESSED_BYTES = 64 * 1024 * 1024
+
+_batch_adapter = TypeAdapter(List[schemas.TelemetryBatchItem])
+
+def decompress(body: bytes, encoding: str):
+    encoding = (encoding or "identity").lower()
+    if encoding == "identity":
+        return body
+    try:
+        # Concatenated gzip members and zstd frames are valid bodies; the size
+        # cap applies to everything inflated so far
+        if encoding == "gzip":
+            data = bytearray()
+            rest = body
+            while True:
+                inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                data += inflater.decompress(rest, MAX_DECOMPRESSED_BYTES + 1 - len(data))
+                if len(data) > MAX_DECOMPRESSED_BYTES:
+                    break
+                if not inflater.eof:
+                    raise HTTPException(status_code=400, detail="Truncated gzip body")
+                rest = inflater.unused_data
+                if not rest:
+                    break
+            data = bytes(data)
+        elif encoding == "zstd" and zstandard is not None:
+            reader = zstandard.ZstdDecompressor().stream_reader(body, read_across_frames=True)
+            data = bytearray()
+            while len(data) <= MAX_DECOMPRESSED_BYTES:
+                block = reader.read(MAX_DECOMPRESSED_BYTES + 1 - len(data))
+                if not block:
+                    break
+                data += block
+            data = bytes(data)
+        else:
+            raise HTTPException(status_code=415, detail=f"Unsupported Content-Encoding: {encoding}")
+    except zlib.error as e:
+        raise HTTPException(status_code=400, detail=f"Invalid {encoding} body: {e}")
+    except getattr(zstandard, "ZstdError", ()) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid {encoding} body: {e}")
+    if len(data) > MAX_DECOMPRESSED_BYTES:
+        raise HTTPException(status_code=413, detail="Decompressed body too large")
+    return data
+
+def decode(content_type: str, body: bytes):
+    media_type = (content_type or JSON).split(";")[0].strip().lower()
+    if media_type == JSON:
+        return _from_items(_validate(_batch_adapter.validate_json, body))
+    if media_type in (MSGPACK, "application/x-msgpack") and msgpack is not None:
+        try:
+            data = msgpack.unpackb(body, raw=False)
+        except (ValueError, msgpack.UnpackException) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid MessagePack body: {e}")
+        return _from_msgpack(data)
+    if media_type == PACKED:
+        return _from_packed(body)
+    raise HTTPException(status_code=415, detail=f"Unsupported Content-Type: {media_type}")
+
+def _validate(validator, data):
+    try:
+        return validator(data)
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+
+def _from_items(items):
+    return [
+        (i.mmsi, i.timestamp, i.rpm, i.speed, i.fuel_consumption, i.latitude, i.longitude, i.heading)
+        for i in items
+    ]
+
+def _from_msgpack(data):
+    if not isinstance(data, list):
+        raise HTTPException(status_code=400, detail="MessagePack body must be an array")
+    if data and all(isinstance(r, (list, tuple)) for r in data):
+        records = []
+        for r in data:
+            if len(r) != 8:
+                raise HTTPException(status_code=400, detail="Positional records need 8 fields")
+            ts = r[1]
+            if isinstance(ts, (int, float)):
+                try:
+                    ts = EPOCH + timedelta(seconds=ts)
+                except (OverflowError, ValueError):
+                    raise HTTPException(status_code=400, detail="Positional timestamp out of range")
+            elif ts is not None:
+                raise HTTPException(status_code=400, detail="Positional timestamp must be epoch seconds")
+            try:
+                # heading may be null, as in the JSON items
+                values = tuple(float(v) for v in r[2:7]) + (None if r[7] is None else float(r[7]),)
+            except (TypeError, ValueError):
+                raise HTTPException(status_code=400, detail="Positional values must be numbers")
+            records.append((str(r[0]), ts) + values)
+        return records
+    return _from_items(_validate(_batch_adapter.validate_python, data))
+
+def _from_packed(body: bytes):
+    view = memoryview(body)
+    if len(view) < _HEADER.size:
+        raise HTTPException(status_code=400, detail="Truncated packed body")
+    magic, segments = _HEADER.unpack_from(view)
+    if magic != PACKED_MAGIC:
+        raise HTTPException(status_code=400, detail="Bad packed magic")
+    records = []
+    offset = _HEADER.size
+    try:
+        for _ in range(segments):
+            mmsi_len = view[offset]
+            mmsi = bytes(view[offset + 1:offset + 1 + mmsi_len]).decode()
+            offset += 1 + mmsi_len
+            (count,) = _COUNT.unpack_from(view, offset)
+            offset += _COUNT.size
+            end = offset + count * RECORD.size
+            if end > len(view):
+                raise HTTPException(status_code=400, detail="Truncated packed body")
+            for us, rpm, speed, fuel, lat, lon, heading in RECORD.iter_unpack(view[offset:end]):
+                ts = EPOCH + timedelta(microseconds=us) if us else None
+                records.append((mmsi, ts, rpm, speed, fuel, lat, lon, heading))
+            offset = end
+    except (IndexError, struct.error, UnicodeDecodeError, OverflowError, ValueError):
+        raise HTTPException(status_code=400, detail="Malformed packed body")
+    if offset != len(view):
+        raise HTTPException(status_code=400, detail="Trailing bytes after packed body")
+    return records
+
+def encode_packed(segments):
+    # Reference encoder for devices and tests: {mmsi: [(timestamp, rpm, speed, fuel, lat, lon, heading), ...]}
+    parts = [_HEADER.pack(PACKED_MAGIC, len(segments))]
+    for mmsi, samples in segments.items():
+        name = mmsi.encode()
+        parts.append(bytes([len(name)]) + name + _COUNT.pack(len(samples)))
+        for ts, *values in samples:
+            us = (ts - EPOCH) // timedelta(microseconds=1) if ts else 0
+            parts.append(RECORD.pack(us, *values))
+    return b"".join(parts)
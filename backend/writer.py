@@ -0,0 +1,145 @@
+from multiprocessing.connection import Client, Listener
+import argparse
+import os
+import queue
+import threading
+import time
+import anomaly, ingest, migrations
+from database import SessionLocal, engine
+
+# Single-writer deployment mode. With several uvicorn workers every worker
+# committing its own inserts fights over SQLite's one write lock. Instead, one
+# writer process owns the write connection: workers forward ingest rows over a
+# Unix socket and the writer commits whatever has queued up from all of them
+# in one transaction, then acknowledges each request. Reads stay in the
+# workers and run in parallel (WAL mode).
+#
+#   python writer.py --socket /tmp/ship-writer.sock
+#   SHIP_WRITER_SOCKET=/tmp/ship-writer.sock uvicorn main:app --workers 4
+
+SOCKET_ENV = "SHIP_WRITER_SOCKET"
+MAX_BATCH_ROWS = 5000
+LINGER_SECONDS = 0.005
+
+def socket_path():
+    return os.environ.get(SOCKET_ENV)
+
+class WriterUnavailable(Exception):
+    pass
+
+class _Request:
+    __slots__ = ("rows", "done", "result")
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.done = threading.Event()
+        self.result = None
+
+class Writer:
+    def __init__(self, address, max_batch_rows=MAX_BATCH_ROWS, linger=LINGER_SECONDS):
+        self.address = address
+        self.max_batch_rows = max_batch_rows
+        self.linger = linger
+        self.pending = queue.Queue()
+        self.commits = 0
+        self.rows = 0
+
+    def serve_forever(self):
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+        listener = Listener(self.address, family="AF_UNIX")
+        os.chmod(self.address, 0o600)
+        threading.Thread(target=self._commit_loop, daemon=True).start()
+        print(f"Writer listening on {self.address}")
+        try:
+            while True:
+                connection = listener.accept()
+                threading.Thread(target=self._serve_connection, args=(connection,), daemon=True).start()
+        finally:
+            listener.close()
+
+    def _serve_connection(self, connection):
+        with connection:
+            while True:
+                try:
+                    rows = connection.recv()
+                except (EOFError, OSError):
+                    return
+                request = _Request(rows)
+                self.pending.put(request)
+                request.done.wait()
+                connection.send(request.result)
+
+    def _next_batch(self):
+        batch = [self.pending.get()]
+        size = len(batch[0].rows)
+        deadline = time.monotonic() + self.linger
+        while size < self.max_batch_rows:
+            try:
+                request = self.pending.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            batch.append(request)
+            size += len(request.rows)
+        return batch
+
+    def _commit_loop(self):
+        db = SessionLocal()
+        while True:
+            batch = self._next_batch()
+            try:
+                results = [ingest.store_rows(db, request.rows) for request in batch]
+                for result in results:
+                    del result["rows"]
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                anomaly.discard({row[0] for request in batch for row in request.rows})
+                results = [{"error": f"{type(e).__name__}: {e}"}] * len(batch)
+            else:
+                self.commits += 1
+                self.rows += sum(len(request.rows) for request in batch)
+            for request, result in zip(batch, results):
+                request.result = result
+                request.done.set()
+
+class WriterClient:
+    # One connection per worker thread; FastAPI runs sync endpoints in a thread pool
+    def __init__(self, address):
+        self.address = address
+        self.local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = self.local.connection = Client(self.address, family="AF_UNIX")
+        return connection
+
+    def write(self, rows):
+        for attempt in range(2):
+            try:
+                connection = self._connection()
+                connection.send(rows)
+                result = connection.recv()
+                break
+            except (EOFError, OSError) as e:
+                # Writer restarted: reconnect once. A request lost mid-flight is
+                # retried by the uploader (at-least-once delivery).
+                self.local.connection = None
+                if attempt:
+                    raise WriterUnavailable(str(e))
+        if "error" in result:
+            raise WriterUnavailable(result["error"])
+        return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Dedicated SQLite writer for multi-worker deployments")
+    parser.add_argument("--socket", default=socket_path() or "/tmp/ship-writer.sock")
+    parser.add_argument("--max-batch-rows", type=int, default=MAX_BATCH_ROWS)
+    parser.add_argument("--linger", type=float, default=LINGER_SECONDS, help="seconds to wait for more requests before committing")
+    args = parser.parse_args()
+    migrations.run(engine)
+    Writer(args.socket, args.max_batch_rows, args.linger).serve_forever()
+
+if __name__ == "__main__":
+    main()
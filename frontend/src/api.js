@@ -13,4 +13,24 @@ api.interceptors.request.use((config) => {
     return config;
 });
 
+// Rebuilds row objects from a `format=columnar` telemetry response (one array
+// per field, timestamps in epoch ms) for components that expect rows.
+export const columnsToRows = (columns) => {
+    const rows = new Array(columns.count);
+    for (let i = 0; i < columns.count; i++) {
+        rows[i] = {
+            id: columns.id[i],
+            ship_id: columns.ship_id[i],
+            timestamp: new Date(columns.timestamp[i]).toISOString().slice(0, -1),
+            rpm: columns.rpm[i],
+            speed: columns.speed[i],
+            fuel_consumption: columns.fuel_consumption[i],
+            latitude: columns.latitude[i],
+            longitude: columns.longitude[i],
+            heading: columns.heading[i],
+        };
+    }
+    return rows;
+};
+
 export default api;
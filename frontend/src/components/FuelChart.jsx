@@ -21,8 +21,9 @@ const FuelChart = ({ data }) => {
                     contentStyle={{ backgroundColor: '#1e293b', border: 'none', borderRadius: '8px', color: '#fff' }}
                     itemStyle={{ color: '#e2e8f0' }}
                 />
-                <Line yAxisId="left" type="monotone" dataKey="fuel_consumption" stroke="#0ea5e9" strokeWidth={2} dot={false} name="Fuel (L/h)" />
-                <Line yAxisId="right" type="monotone" dataKey="rpm" stroke="#10b981" strokeWidth={2} dot={false} name="RPM" />
+                {/* Senders skip unchanged samples (deadband), so each value holds until the next one */}
+                <Line yAxisId="left" type="stepAfter" dataKey="fuel_consumption" stroke="#0ea5e9" strokeWidth={2} dot={false} name="Fuel (L/h)" />
+                <Line yAxisId="right" type="stepAfter" dataKey="rpm" stroke="#10b981" strokeWidth={2} dot={false} name="RPM" />
             </LineChart>
         </ResponsiveContainer>
     );
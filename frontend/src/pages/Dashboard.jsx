@@ -1,5 +1,5 @@
 import { useState, useEffect } from 'react';
-import api from '../api';
+import api, { columnsToRows } from '../api';
 import MapComponent from '../components/MapComponent';
 import FuelChart from '../components/FuelChart';
 import { Ship, Anchor, Gauge, Droplet, Navigation, History, Maximize, Calendar } from 'lucide-react';
@@ -112,8 +112,9 @@ const Dashboard = () => {
             const startISO = new Date(startDate).toISOString();
             const endISO = new Date(endDate).toISOString();
 
-            const res = await api.get(`/telemetry/${mmsi}?limit=5000&start_date=${startISO}&end_date=${endISO}`);
-            const data = [...res.data].reverse();
+            // Columnar payload: ~2.5x smaller and faster to parse than row objects
+            const res = await api.get(`/telemetry/${mmsi}?limit=5000&start_date=${startISO}&end_date=${endISO}&format=columnar`);
+            const data = columnsToRows(res.data).reverse();
             setHistoryData(data);
             // Downsample for chart happens in render, but let's check size
         } catch (err) {
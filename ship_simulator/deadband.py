@@ -0,0 +1,49 @@
+import math
+import time
+
+# Deadband filter for outgoing samples. A sample is sent only when it differs
+# from the last *sent* sample of that ship by more than a threshold (position
+# in metres, speed, RPM, fuel), or when max_silence seconds have passed since
+# the last one was sent. Comparing against the last sent sample (not the last
+# seen one) keeps slow drifts from slipping through unnoticed.
+#
+# The backend treats the stream as step-wise: a value holds until the next
+# sample. The error of that reconstruction stays within the thresholds, and a
+# gap longer than max_silence means the ship was offline.
+
+EARTH_RADIUS_M = 6371008.8
+
+class Deadband:
+    def __init__(self, position_m=25.0, speed=0.5, rpm=50.0, fuel=2.0, max_silence=300):
+        self.thresholds = {"speed": speed, "rpm": rpm, "fuel_consumption": fuel}
+        self.position_m = position_m
+        self.max_silence = max_silence
+        self.last_sent = {}  # mmsi -> (monotonic time, sample)
+        self.sent = 0
+        self.suppressed = 0
+
+    def check(self, mmsi, sample, now=None):
+        # True when the sample has to go out; it then becomes the new reference
+        now = time.monotonic() if now is None else now
+        last = self.last_sent.get(mmsi)
+        if last is None or now - last[0] >= self.max_silence or self._changed(last[1], sample):
+            self.last_sent[mmsi] = (now, sample)
+            self.sent += 1
+            return True
+        self.suppressed += 1
+        return False
+
+    def _changed(self, old, new):
+        for field, threshold in self.thresholds.items():
+            a, b = old.get(field), new.get(field)
+            if (a is None) != (b is None) or (a is not None and abs(b - a) > threshold):
+                return True
+        if None in (old.get("latitude"), old.get("longitude"), new.get("latitude"), new.get("longitude")):
+            return old.get("latitude") != new.get("latitude") or old.get("longitude") != new.get("longitude")
+        return _distance_m(old["latitude"], old["longitude"], new["latitude"], new["longitude"]) > self.position_m
+
+def _distance_m(lat1, lon1, lat2, lon2):
+    # Equirectangular approximation; plenty for distances of a few hundred metres
+    x = math.radians(lon2 - lon1) * math.cos(math.radians((lat1 + lat2) / 2))
+    y = math.radians(lat2 - lat1)
+    return EARTH_RADIUS_M * math.hypot(x, y)
@@ -3,14 +3,28 @@ import time
 import random
 import math
 from datetime import datetime
+from spool import Spool, Uploader
+from deadband import Deadband
 
 # Configuration
 API_URL = "http://localhost:8000"
 SHIPS = [
     {"name": "Realtime Dredger A", "mmsi": "REAL001", "weight": 4500.0},
-    {"name": "Realtime Cargo B", "mmsi": "REAL002", "weight": 1500.0}
+    {"name": "Realtime Cargo B", "mmsi": "REAL002", "weight": 1500.0},
+    {"name": "Realtime Tug C", "mmsi": "REAL003", "weight": 800.0, "moored": True}
 ]
 
+# Deadband: a sample is only sent when it moves past one of these thresholds,
+# or after MAX_SILENCE seconds without sending (keep it under the backend's
+# 10-minute gap limit so idle time is still counted). Set DEADBAND = None to
+# send every sample.
+DEADBAND = {"position_m": 25.0, "speed": 0.5, "rpm": 50.0, "fuel": 2.0}
+MAX_SILENCE = 300
+
+# Upload at most this many batches per 30 s tick, so a large backlog after an
+# outage is worked off over several ticks instead of stalling the simulation
+MAX_BATCHES_PER_TICK = 5
+
 # Create Ships first to ensure weight is set
 def register_ships():
     for ship in SHIPS:
@@ -22,12 +36,14 @@ def register_ships():
 
 positions = {
     "REAL001": {"lat": 10.762622, "lon": 106.660172},
-    "REAL002": {"lat": 10.34599, "lon": 107.08426}
+    "REAL002": {"lat": 10.34599, "lon": 107.08426},
+    "REAL003": {"lat": 10.75960, "lon": 106.79380}
 }
 
 vectors = {
     "REAL001": {"d_lat": -0.0005, "d_lon": 0.0005}, 
-    "REAL002": {"d_lat": 0.0005, "d_lon": -0.0005}  
+    "REAL002": {"d_lat": 0.0005, "d_lon": -0.0005},
+    "REAL003": {"d_lat": 0.0, "d_lon": 0.0}
 }
 
 def calculate_heading(lat1, lon1, lat2, lon2):
@@ -40,7 +56,10 @@ def calculate_heading(lat1, lon1, lat2, lon2):
 
 def simulate():
     register_ships()
-    print(f"Starting advanced simulation for {len(SHIPS)} ships...")
+    spool = Spool()
+    uploader = Uploader(spool, API_URL)
+    deadband = Deadband(**DEADBAND, max_silence=MAX_SILENCE) if DEADBAND else None
+    print(f"Starting advanced simulation for {len(SHIPS)} ships ({len(spool)} samples spooled)...")
     
     while True:
         for ship in SHIPS:
@@ -50,19 +69,26 @@ def simulate():
             
             old_lat, old_lon = pos["lat"], pos["lon"]
             
-            # Update Position
-            pos["lat"] += vec["d_lat"] + random.uniform(-0.0001, 0.0001)
-            pos["lon"] += vec["d_lon"] + random.uniform(-0.0001, 0.0001)
+            # Update Position (a moored ship only sees GPS jitter of a few metres)
+            jitter = 0.00002 if ship.get("moored") else 0.0001
+            pos["lat"] += vec["d_lat"] + random.uniform(-jitter, jitter)
+            pos["lon"] += vec["d_lon"] + random.uniform(-jitter, jitter)
             
             # Calculate Heading
             heading = calculate_heading(math.radians(old_lat), math.radians(old_lon), math.radians(pos["lat"]), math.radians(pos["lon"]))
             
             # Simulate Data
-            rpm = random.uniform(1800, 2200)
-            speed = random.uniform(10, 15)
-            fuel = rpm * 0.1 + speed * 2 + random.uniform(-5, 5)
+            if ship.get("moored"):
+                rpm = random.uniform(0, 10)
+                speed = random.uniform(0, 0.2)
+                fuel = random.uniform(0, 0.5)
+            else:
+                rpm = random.uniform(1800, 2200)
+                speed = random.uniform(10, 15)
+                fuel = rpm * 0.1 + speed * 2 + random.uniform(-5, 5)
             
             payload = {
+                "timestamp": datetime.utcnow().isoformat(),
                 "rpm": rpm,
                 "speed": speed,
                 "fuel_consumption": fuel,
@@ -71,13 +97,20 @@ def simulate():
                 "heading": heading
             }
             
-            try:
-                # Send Data
-                url = f"{API_URL}/telemetry/{mmsi}"
-                requests.post(url, json=payload)
-                print(f"[{datetime.now().strftime('%H:%M:%S')}] {ship['name']} -> Sent (Heading: {int(heading)}°)")
-            except Exception as e:
-                print(f"Connection Error: {e}")
+            if deadband is not None and not deadband.check(mmsi, payload):
+                continue
+
+            # Queue locally; the uploader forwards whenever the backend is reachable
+            spool.put(mmsi, payload)
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] {ship['name']} -> Queued (Heading: {int(heading)}°)")
+
+        sent, dropped = uploader.drain(max_batches=MAX_BATCHES_PER_TICK)
+        if sent:
+            print(f"Uploaded {sent} samples ({len(spool)} still spooled)")
+        if dropped:
+            print(f"Dropped {dropped} samples rejected by the backend")
+        if deadband is not None and deadband.suppressed:
+            print(f"Deadband: {deadband.sent} sent, {deadband.suppressed} unchanged samples skipped")
         
         # Wait 30 seconds before next update
         time.sleep(30)
@@ -0,0 +1,103 @@
+import gzip
+import json
+import random
+import sqlite3
+import time
+
+import requests
+
+# Store-and-forward queue for telemetry samples. Every sample is written to a
+# local SQLite file first and only removed once the backend has acknowledged
+# it, so samples survive connection loss and restarts (at-least-once, in order).
+class Spool:
+    def __init__(self, path="spool.db"):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS samples (seq INTEGER PRIMARY KEY AUTOINCREMENT, payload TEXT NOT NULL)"
+        )
+        self.conn.commit()
+
+    def put(self, mmsi, sample):
+        payload = json.dumps({"mmsi": mmsi, **sample}, separators=(",", ":"))
+        self.conn.execute("INSERT INTO samples (payload) VALUES (?)", (payload,))
+        self.conn.commit()
+
+    def peek(self, limit):
+        # Oldest first; only `limit` rows are ever held in memory
+        return self.conn.execute("SELECT seq, payload FROM samples ORDER BY seq LIMIT ?", (limit,)).fetchall()
+
+    def ack(self, last_seq):
+        self.conn.execute("DELETE FROM samples WHERE seq <= ?", (last_seq,))
+        self.conn.commit()
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM samples").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+
+# Drains a Spool to POST /telemetry/batch as gzip-compressed JSON arrays.
+# Batch size grows while uploads succeed and shrinks on failure; after a
+# failure the uploader backs off exponentially (with jitter) before retrying.
+# drain() returns (sent, dropped): samples the backend accepted, and samples it
+# rejected with a 4xx that were removed from the spool anyway.
+class Uploader:
+    def __init__(self, spool, api_url, min_batch=1, max_batch=500, max_backoff=300, timeout=15):
+        self.spool = spool
+        self.url = f"{api_url}/telemetry/batch"
+        self.min_batch = min_batch
+        self.max_batch = max_batch
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.batch_size = min_batch
+        self.failures = 0
+        self.retry_at = 0.0
+
+    def drain(self, max_batches=None):
+        sent = 0
+        dropped = 0
+        batches = 0
+        while time.monotonic() >= self.retry_at and (max_batches is None or batches < max_batches):
+            batch = self.spool.peek(self.batch_size)
+            if not batch:
+                break
+            body = gzip.compress(("[" + ",".join(payload for _, payload in batch) + "]").encode())
+            try:
+                resp = requests.post(
+                    self.url,
+                    data=body,
+                    headers={"Content-Type": "application/json", "Content-Encoding": "gzip"},
+                    timeout=self.timeout,
+                )
+            except requests.RequestException as e:
+                self._failed(f"Connection Error: {e}")
+                break
+
+            if resp.status_code >= 500 or resp.status_code in (408, 429):
+                self._failed(f"Server busy ({resp.status_code})")
+                break
+            if resp.status_code >= 400:
+                # Rejected payload: narrow down to the offending sample, then drop it
+                if len(batch) > 1:
+                    self.batch_size = 1
+                    continue
+                print(f"Dropping rejected sample #{batch[0][0]} ({resp.status_code}): {resp.text[:200]}")
+                dropped += 1
+            else:
+                sent += len(batch)
+
+            self.spool.ack(batch[-1][0])
+            batches += 1
+            self.failures = 0
+            self.batch_size = min(self.max_batch, self.batch_size * 2)
+        return sent, dropped
+
+    def _failed(self, reason):
+        self.failures += 1
+        self.batch_size = max(self.min_batch, self.batch_size // 2)
+        delay = min(self.max_backoff, 2 ** self.failures) * random.uniform(0.5, 1.0)
+        self.retry_at = time.monotonic() + delay
+        print(f"{reason} - {len(self.spool)} samples spooled, retrying in {int(delay)}s")